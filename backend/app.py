@@ -1,48 +1,217 @@
-from flask import Flask, jsonify, request
+import json
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from threading import Thread
 import audio_handler
+import metrics
+import model_registry
+from segment_log import SegmentLog
+from sessions import SessionManager
 
 app = Flask(__name__)
 CORS(app)
 
-# Global variables
-is_recording = False
-chunk_number = 1
-recording_thread = None
-
-def record_audio_wrapper():
-    """Wrapper function to handle global variables for the audio handler."""
-    global is_recording, chunk_number
-    # Use lists to pass by reference since integers are immutable
-    is_recording_ref = [is_recording]
-    chunk_number_ref = [chunk_number]
-    
-    audio_handler.record_audio(is_recording_ref, chunk_number_ref)
-    
-    # Update global variables after recording
-    chunk_number = chunk_number_ref[0]
+segment_log = SegmentLog()  # Every transcribed segment, for /transcript and /transcript/stream
+sessions = SessionManager(segment_log=segment_log)  # All recordings share one worker pool and model
+DEFAULT_SESSION = "default"  # Session used by /start and /stop
+KEEPALIVE_SECONDS = 15  # Idle time after which the stream sends a comment to keep the connection open
+
+# Session stats exported as gauges by /metrics: metric name -> (stats key, help)
+SESSION_GAUGES = {
+    "session_queue_depth": ("queue_depth", "Chunks waiting for a transcription worker."),
+    "session_in_flight": ("in_flight", "Chunks being transcribed."),
+    "session_backlog_seconds": ("backlog_seconds", "Seconds of audio captured but not yet transcribed."),
+    "session_last_lag_seconds": ("last_lag_seconds", "Capture-to-transcript delay of the last chunk."),
+    "session_captured_chunks": ("captured", "Chunks captured since the session started."),
+    "session_transcribed_chunks": ("transcribed", "Chunks transcribed since the session started."),
+    "session_failed_chunks": ("failed", "Chunks whose transcription failed."),
+    "session_dropped_chunks": ("dropped", "Chunks discarded by the queue's overflow policy."),
+    "session_input_overflows": ("input_overflows", "Blocks the audio device reported as overflowed."),
+    "session_ring_overruns": ("ring_overruns", "Reads that fell behind the capture ring buffer."),
+}
+
+def _session_gauge(key):
+    def collect():
+        values = []
+        for session in sessions.sessions():
+            info = session.info()
+            if key in info:
+                values.append(({"session": session.session_id}, info[key]))
+        return values
+    return collect
+
+for name, (key, help) in SESSION_GAUGES.items():
+    metrics.register_gauge(name, help, _session_gauge(key))
+metrics.register_gauge("busy_workers", "Shared transcription workers currently transcribing.",
+                       lambda: [({}, sessions.stats().get("busy_workers", 0))])
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Report whether the model is loaded and warmed up, for clients waiting on startup.
+
+    Returns 200 once transcription is ready and 503 while the model is still importing,
+    loading or warming up (or if that failed), with the warm-up progress in the body.
+    Recording can be started before then; its chunks wait for the model.
+    """
+    warm_up = model_registry.warm_up_status()
+    ready = warm_up["state"] == "ready"
+    return jsonify({"status": "ok", "ready": ready, "warm_up": warm_up}), 200 if ready else 503
 
 @app.route('/start', methods=['POST'])
 def start_recording():
     """Start recording audio."""
-    global is_recording, recording_thread
-    if not is_recording:
-        is_recording = True
-        recording_thread = Thread(target=record_audio_wrapper)
-        recording_thread.start()
-        return jsonify({"status": "Recording started"})
-    return jsonify({"status": "Already recording"})
+    session = sessions.get(DEFAULT_SESSION)
+    if session is not None and session.is_recording:
+        return jsonify({"status": "Already recording"})
+    sessions.start(DEFAULT_SESSION, output_dir="audio_chunks")
+    return jsonify({"status": "Recording started"})
 
 @app.route('/stop', methods=['POST'])
 def stop_recording():
-    """Stop recording audio."""
-    global is_recording, recording_thread
-    if is_recording:
-        is_recording = False
-        recording_thread.join()
-        return jsonify({"status": "Recording stopped"})
+    """
+    Stop recording audio.
+
+    Returns as soon as capture has stopped; the last, partial chunk and anything still
+    queued are transcribed in the background (see "state" in /stats).
+    """
+    session = sessions.get(DEFAULT_SESSION)
+    if session is not None and session.is_recording:
+        sessions.stop(DEFAULT_SESSION, wait=False)
+        return jsonify({"status": "Recording stopped", "state": session.state})
     return jsonify({"status": "Not recording"})
 
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Report queue depth, backlog and transcription lag of the current recording."""
+    session = sessions.get(DEFAULT_SESSION)
+    if session is None:
+        return jsonify({"is_running": False, "state": "stopped", "next_chunk_number": 1})
+    if not session.is_recording:
+        return jsonify(session.info())
+    return jsonify(session.pipeline.stats())
+
+@app.route('/sessions', methods=['GET'])
+def list_sessions():
+    """List all sessions and the shared worker pool."""
+    return jsonify({"sessions": [session.info() for session in sessions.sessions()],
+                    "pool": sessions.stats()})
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    """
+    Start a new recording session.
+
+    JSON body (all optional): {"id": ..., "device_index": ..., "output_dir": ...}
+    """
+    options = request.get_json(silent=True) or {}
+    session_id = options.get("id")
+    existing = sessions.get(session_id) if session_id else None
+    if existing is not None and existing.is_recording:
+        return jsonify({"error": f"Session {session_id} is already recording"}), 409
+    session = sessions.start(session_id,
+                             options.get("device_index", audio_handler.DEVICE_INDEX),
+                             options.get("output_dir"))
+    return jsonify(session.info()), 201
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Report one session's state and pipeline stats."""
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"No session {session_id}"}), 404
+    return jsonify(session.info())
+
+@app.route('/sessions/<session_id>/start', methods=['POST'])
+def restart_session(session_id):
+    """Start a stopped session again, continuing its chunk numbering."""
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"No session {session_id}"}), 404
+    return jsonify(sessions.start(session_id).info())
+
+@app.route('/sessions/<session_id>/stop', methods=['POST'])
+def stop_session(session_id):
+    """
+    Stop a session. Its queued chunks are transcribed in the background unless ?wait=1,
+    in which case this returns once they are done.
+    """
+    session = sessions.stop(session_id, wait=request.args.get('wait', 0, type=int) == 1)
+    if session is None:
+        return jsonify({"error": f"No session {session_id}"}), 404
+    return jsonify(session.info())
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Stop a session and forget it (its files are kept)."""
+    session = sessions.remove(session_id)
+    if session is None:
+        return jsonify({"error": f"No session {session_id}"}), 404
+    return jsonify(session.info())
+
+@app.route('/transcript', methods=['GET'])
+def get_transcript():
+    """
+    Return the segments transcribed since an offset.
+
+    Query: since=<offset> (default 0), limit=<n>. Pass the returned "next" as since on the
+    following call to get only new segments.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+    segments = segment_log.since(since, limit)
+    next_offset = segments[-1]["offset"] + 1 if segments else max(since, segment_log.first_offset)
+    return jsonify({"segments": segments, "next": next_offset, "first": segment_log.first_offset})
+
+@app.route('/transcript/stream', methods=['GET'])
+def stream_transcript():
+    """
+    Push segments to the client as soon as they are transcribed (Server-Sent Events).
+
+    Starts at ?since=<offset> (default: only new segments), or after the Last-Event-ID
+    header when the browser reconnects.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', None, type=int)
+    if last_event_id is not None:
+        since = last_event_id + 1
+    else:
+        since = request.args.get('since', segment_log.next_offset, type=int)
+
+    def events():
+        offset = since
+        while True:
+            segments = segment_log.wait(offset, timeout=KEEPALIVE_SECONDS)
+            if not segments:
+                yield ": keepalive\n\n"
+                continue
+            for segment in segments:
+                yield f"id: {segment['offset']}\nevent: segment\ndata: {json.dumps(segment)}\n\n"
+            offset = segments[-1]["offset"] + 1
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latency histograms, queue depth, backlog, model RTF and session gauges for Prometheus."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiler', methods=['GET'])
+def profiler_status():
+    """Report whether the sampling profiler is running and how many samples it has taken."""
+    return jsonify(metrics.profiler.status())
+
+@app.route('/profiler/start', methods=['POST'])
+def start_profiler():
+    """Start sampling every thread's stack every ?interval=<seconds> (default 0.01)."""
+    metrics.profiler.start(request.args.get('interval', metrics.PROFILE_INTERVAL_SECONDS, type=float))
+    return jsonify(metrics.profiler.status())
+
+@app.route('/profiler/stop', methods=['POST'])
+def stop_profiler():
+    """Stop the sampling profiler and return its folded stacks (flame graph input)."""
+    return Response(metrics.profiler.stop(), mimetype='text/plain')
+
 if __name__ == "__main__":
-    app.run(port=5000)
\ No newline at end of file
+    # Serve right away and load the model in the background; /health reports when it is ready
+    model_registry.start_warm_up(audio_handler.MODEL_NAME, prepare=audio_handler.preload)
+    app.run(port=5000, threaded=True)  # Each streaming client holds a thread
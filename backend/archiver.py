@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import wave
+
+import numpy as np
+
+import metrics
+
+
+class WavArchiver:
+    def __init__(self, max_pending=8):
+        """
+        Write captured audio to WAV files on a background thread.
+
+        Archiving is kept off the capture and transcription hot path: submit() only
+        queues the samples, and a single writer thread does the disk I/O.
+
+        Args:
+            max_pending: Number of chunks that may wait to be written (default: 8)
+        """
+        self.write_queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._write_loop, name="wav-archiver")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, filename, samples, rate, on_written=None):
+        """
+        Queue int16 samples of shape (frames, channels) to be saved as a WAV file.
+
+        Args:
+            on_written: Optional function called on the writer thread once the file is
+                complete on disk (not called if writing fails)
+
+        Returns:
+            bool: False if the archive queue is full and the chunk was not saved
+        """
+        try:
+            self.write_queue.put_nowait((filename, samples, rate, on_written))
+            return True
+        except queue.Full:
+            print(f"Archive queue full, not saving {filename}")
+            return False
+
+    def close(self):
+        """Write everything still queued and stop the writer thread."""
+        self.write_queue.put(None)
+        self._thread.join()
+
+    def _write_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            filename, samples, rate, on_written = item
+            try:
+                with metrics.STAGE_SECONDS.time(stage="wav_write"):
+                    write_wav(filename, samples, rate)
+                print(f"Saved chunk to {filename}")
+            except Exception as e:
+                print(f"Error saving {filename}: {e}")
+                continue
+            if on_written is not None:
+                on_written()
+
+
+def write_wav(filename, samples, rate):
+    """
+    Save int16 samples of shape (frames, channels) or (frames,) as a 16-bit WAV file.
+
+    The file is written to filename + ".tmp", fsync'd and then renamed into place, so after
+    a crash filename is either missing or complete, never truncated.
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp = filename + ".tmp"
+    try:
+        with open(temp, 'wb') as f:
+            with wave.open(f, 'wb') as wf:
+                wf.setnchannels(channels)
+                wf.setsampwidth(2)
+                wf.setframerate(rate)
+                wf.writeframes(samples.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, filename)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    _fsync_directory(directory or ".")
+
+
+def _fsync_directory(directory):
+    """Make a rename in directory durable (not possible on Windows, where it is a no-op)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_wav(filename):
+    """
+    Load a 16-bit WAV file written by write_wav.
+
+    Returns:
+        tuple: (int16 samples of shape (frames, channels), sample_rate)
+    """
+    with wave.open(filename, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{filename}: only 16-bit WAV files are supported")
+        data = wf.readframes(wf.getnframes())
+        if len(data) != wf.getnframes() * wf.getnchannels() * 2:
+            raise ValueError(f"{filename}: truncated, {len(data)} of {wf.getnframes() * wf.getnchannels() * 2} bytes")
+        return np.frombuffer(data, dtype=np.int16).reshape(-1, wf.getnchannels()), wf.getframerate()
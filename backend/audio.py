@@ -1,15 +1,19 @@
 import pyaudio
-import wave
-import whisper
+import audio_utils
+import model_registry
 import os
-from threading import Thread
-
-# Audio recording parameters
-FORMAT = pyaudio.paInt16
-CHANNELS = 2
-RATE = 44100
-CHUNK = 1024
-CHUNK_DURATION = 2 * 60  # 2 minutes in seconds for testing
+import time
+from archiver import WavArchiver
+from audio_handler import open_capture, record_chunks, TARGET_RATE, TARGET_CHANNELS
+from governor import ModelGovernor, MODELS
+from pipeline import TranscriptionPipeline, CancellationToken, BLOCK
+
+# Capture format and pause-aligned chunking are shared with audio_handler
+MODEL_NAME = "base"  # Use "tiny", "base", "small", "medium", or "large"
+ADAPTIVE_MODEL = True  # Start with MODEL_NAME, then switch between governor.MODELS as speed and backlog allow
+CPU_PROFILE = False  # On CPU-only hosts: int8 models and torch threads split between workers (see model_registry)
+NUM_WORKERS = 2  # Transcription worker threads
+MAX_QUEUED_CHUNKS = 4  # Chunks waiting for a worker before capture has to wait
 
 def list_input_devices():
     """List all available audio input devices."""
@@ -19,44 +23,21 @@ def list_input_devices():
         info = p.get_device_info_by_index(i)
         print(f"{i}: {info['name']}")
     p.terminate()
-     
-def record_audio_chunk(output_filename, device_index, record_seconds):
-    """Record a chunk of audio and save it to a file."""
-    p = pyaudio.PyAudio()       
-    stream = p.open(format=FORMAT,
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    input_device_index=device_index,
-                    frames_per_buffer=CHUNK)
-
-    frames = []
-
-    print(f"Recording chunk: {output_filename}...")
-    try:
-        for _ in range(0, int(RATE / CHUNK * record_seconds)):
-            data = stream.read(CHUNK)
-            frames.append(data)
-    except KeyboardInterrupt:
-        print("\nRecording interrupted by user.")
-
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-
-    with wave.open(output_filename, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
-
-    print(f"Saved chunk to {output_filename}")
 
-def transcribe_audio(file_path, chunk_number):
-    """Transcribe audio using Whisper and save the transcription to a text file."""
-    print(f"Transcribing {file_path}...")
-    model = whisper.load_model("base")  # Use "tiny", "base", "small", "medium", or "large"
-    result = model.transcribe(file_path)
+def transcribe_audio(audio, chunk_number, governor=None):
+    """
+    Transcribe audio (file path or float32 16 kHz array) and save the transcription to a text file.
+
+    With a governor (governor.ModelGovernor), it picks the model and is told how long the
+    call took.
+    """
+    model_name = governor.current if governor is not None else MODEL_NAME
+    print(f"Transcribing chunk {chunk_number} with model '{model_name}'...")
+    model = model_registry.get_model(model_name)  # Loaded once and shared across chunks
+    started = time.perf_counter()
+    result = model_registry.transcribe(model, audio)  # Workers take turns on the shared model
+    if governor is not None and not isinstance(audio, str):
+        governor.record(model_name, len(audio) / TARGET_RATE, started, time.perf_counter())
     transcription = result['text']
     print(f"Transcription for chunk {chunk_number}:\n{transcription}")
 
@@ -68,9 +49,10 @@ def transcribe_audio(file_path, chunk_number):
 
     return transcription
 
-def process_chunk(chunk_filename, chunk_number):
+def process_chunk(chunk, governor=None):
     """Process a recorded chunk: transcribe and save the text."""
-    transcribe_audio(chunk_filename, chunk_number)
+    transcribe_audio(audio_utils.to_whisper_audio(chunk.audio, TARGET_RATE, TARGET_CHANNELS), chunk.number,
+                     governor)
 
 def main():
     # List input devices and set the correct device index
@@ -78,27 +60,47 @@ def main():
     # list_input_devices()
     device_index = 2  # Replace with the correct device index for VB-Audio Virtual Cable
 
+    if CPU_PROFILE:
+        model_registry.enable_cpu_profile(NUM_WORKERS)
+
     # Create a directory to store audio chunks
     os.makedirs("audio_chunks", exist_ok=True)
-
-    chunk_number = 1
-    previous_thread = None
-
-    while True:
-        chunk_filename = f"audio_chunks/chunk_{chunk_number}.wav"
-
-        # Record a chunk
-        record_audio_chunk(chunk_filename, device_index, CHUNK_DURATION)
-
-        # Start transcription of the previous chunk in a separate thread
-        if previous_thread is not None:
-            previous_thread.join()  # Ensure the previous transcription is complete
-
-        previous_thread = Thread(target=process_chunk, args=(chunk_filename, chunk_number))
-        previous_thread.start()
-
-        # Move to the next chunk
-        chunk_number += 1
+    archiver = WavArchiver()
+    cancel_token = CancellationToken()  # Lets Ctrl+C cut the current chunk short
+    chunks = record_chunks(open_capture(device_index), cancel_token)
+
+    def capture_chunk(chunk_number):
+        item = next(chunks, None)
+        if item is None:
+            return None
+        samples, start = item
+        print(f"Recorded chunk {chunk_number} starting at {start:.2f}s")
+        archiver.submit(f"audio_chunks/chunk_{chunk_number}.wav", samples, TARGET_RATE)
+        return samples, len(samples) / TARGET_RATE, start
+
+    def finish():
+        chunks.close()
+        archiver.close()
+
+    governor = None
+    if ADAPTIVE_MODEL and MODEL_NAME in MODELS:
+        governor = ModelGovernor(MODELS, MODEL_NAME, backlog=lambda: pipeline.queued_seconds)
+
+    # Recording continues while earlier chunks are transcribed by the worker pool
+    pipeline = TranscriptionPipeline(capture_chunk, lambda chunk: process_chunk(chunk, governor),
+                                     num_workers=NUM_WORKERS,
+                                     max_queued_chunks=MAX_QUEUED_CHUNKS,
+                                     overflow_policy=BLOCK,
+                                     on_stop=finish,
+                                     cancel_token=cancel_token)
+    pipeline.start()
+    try:
+        while pipeline.is_running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        pipeline.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,15 +7,22 @@ import os
 import speech_recognition as sr
 from datetime import datetime
 import queue
+import metrics
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from scipy.io import wavfile
-import librosa
-import librosa.display
+from features import FeatureExtractor, extract_file
+from history import RingHistory, DownsampledHistory
+
+LIVE_HISTORY_BLOCKS = 1000  # Per-block values kept for live display (~64 s at the defaults)
+ARCHIVE_BLOCKS_PER_POINT = 16  # Blocks averaged into one long-term point (~1 s at the defaults)
+ARCHIVE_POINTS = 24 * 60 * 60  # Long-term points kept (~24 h at the defaults)
 
 class ZoomAudioAnalyzer:
     def __init__(self, format=pyaudio.paInt16, channels=1, rate=16000, chunk=1024, 
-                 record_seconds=120, output_dir="recordings"):
+                 record_seconds=120, output_dir="recordings", speech_threshold=1000,
+                 recognition_workers=2, max_pending_recognitions=4):
         """
         Initialize the Zoom audio analyzer.
         
@@ -26,6 +33,9 @@ class ZoomAudioAnalyzer:
             chunk: Audio chunk size (default: 1024)
             record_seconds: Maximum recording duration in seconds (default: 120)
             output_dir: Directory to save audio recordings (default: "recordings")
+            speech_threshold: Mean absolute amplitude above which a block counts as speech (default: 1000)
+            recognition_workers: Threads running speech recognition (default: 2)
+            max_pending_recognitions: Recognition jobs allowed queued or running at once (default: 4)
         """
         self.format = format
         self.channels = channels
@@ -33,6 +43,7 @@ class ZoomAudioAnalyzer:
         self.chunk = chunk
         self.record_seconds = record_seconds
         self.output_dir = output_dir
+        self.speech_threshold = speech_threshold
         
         # Create output directory if it doesn't exist
         if not os.path.exists(output_dir):
@@ -43,6 +54,9 @@ class ZoomAudioAnalyzer:
         
         # Speech recognition
         self.recognizer = sr.Recognizer()
+        self.recognition_executor = ThreadPoolExecutor(max_workers=recognition_workers)
+        self.recognition_slots = threading.BoundedSemaphore(max_pending_recognitions)
+        self.skipped_recognitions = 0
         
         # Analysis results
         self.is_speech_active = False
@@ -51,10 +65,23 @@ class ZoomAudioAnalyzer:
         self.is_recording = False
         self.audio_data_queue = queue.Queue()
         
-        # Audio frames and analysis data
-        self.frames = []
-        self.volume_history = []
-        self.speech_activity_history = []
+        # Recording file (written while capturing) and bounded analysis histories
+        self.recording_filename = None
+        self.frames_written = 0
+        self._wav_file = None
+        self._threads = []
+        self.feature_extractor = None
+        self._reset_histories()
+
+    def _reset_histories(self):
+        """
+        Create empty fixed-size histories: recent per-block values for live display, and
+        a downsampled long-term archive of the whole session.
+        """
+        self.volume_history = RingHistory(LIVE_HISTORY_BLOCKS)
+        self.speech_activity_history = RingHistory(LIVE_HISTORY_BLOCKS, dtype=np.uint8)
+        self.volume_archive = DownsampledHistory(ARCHIVE_BLOCKS_PER_POINT, ARCHIVE_POINTS)
+        self.speech_activity_archive = DownsampledHistory(ARCHIVE_BLOCKS_PER_POINT, ARCHIVE_POINTS)
 
     def _get_input_device_index(self):
         """
@@ -85,10 +112,18 @@ class ZoomAudioAnalyzer:
             print("Already recording!")
             return
             
+        self._reset_histories()
+        
+        # Open the output file now; audio is streamed into it while recording
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.recording_filename = os.path.join(self.output_dir, f"zoom_recording_{timestamp}.wav")
+        self._wav_file = wave.open(self.recording_filename, 'wb')
+        self._wav_file.setnchannels(self.channels)
+        self._wav_file.setsampwidth(self.p.get_sample_size(self.format))
+        self._wav_file.setframerate(self.rate)
+        self.frames_written = 0
+        self.feature_extractor = FeatureExtractor(self.rate)
         self.is_recording = True
-        self.frames = []
-        self.volume_history = []
-        self.speech_activity_history = []
         
         # Start recording thread
         record_thread = threading.Thread(target=self._record_audio)
@@ -99,6 +134,7 @@ class ZoomAudioAnalyzer:
         analysis_thread = threading.Thread(target=self._analyze_audio)
         analysis_thread.daemon = True
         analysis_thread.start()
+        self._threads = [record_thread, analysis_thread]
         
         print("Recording and analysis started!")
 
@@ -106,30 +142,38 @@ class ZoomAudioAnalyzer:
         """
         Stop recording and save the audio file.
         """
-        if not self.is_recording:
+        if self._wav_file is None:
             print("Not recording!")
             return
             
         self.is_recording = False
-        time.sleep(0.5)  # Wait for threads to finish
+        for thread in self._threads:
+            thread.join(timeout=2)  # Wait for threads to finish
+        self._threads = []
         
-        # Save recording
-        if len(self.frames) > 0:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.output_dir, f"zoom_recording_{timestamp}.wav")
-            
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.p.get_sample_size(self.format))
-            wf.setframerate(self.rate)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
-            
+        # Features were computed while recording; catch up on blocks the analysis thread didn't reach
+        while True:
+            try:
+                self._update_features(self.audio_data_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        # The audio is already on disk; closing only writes the final header sizes
+        self._wav_file.close()
+        self._wav_file = None
+        filename = self.recording_filename
+        
+        if self.frames_written > 0:
             print(f"Recording saved to {filename}")
             
-            # Perform full analysis on saved file
-            self._analyze_saved_file(filename)
+            # Perform full analysis on saved file, reusing the live features if they cover it
+            extractor = self.feature_extractor
+            if extractor.samples_seen != self.frames_written:
+                extractor = None
+            with metrics.STAGE_SECONDS.time(stage="analyzer_post_analysis"):
+                self._analyze_saved_file(filename, extractor)
         else:
+            os.remove(filename)
             print("No audio data captured!")
 
     def _record_audio(self):
@@ -157,7 +201,11 @@ class ZoomAudioAnalyzer:
                     break
                     
                 data = stream.read(self.chunk, exception_on_overflow=False)
-                self.frames.append(data)
+                
+                # Append to the WAV file; the header is patched once when it is closed
+                with metrics.STAGE_SECONDS.time(stage="analyzer_wav_write"):
+                    self._wav_file.writeframesraw(data)
+                self.frames_written += len(data) // (self.channels * self.p.get_sample_size(self.format))
                 
                 # Add to queue for real-time analysis
                 self.audio_data_queue.put(data)
@@ -173,55 +221,97 @@ class ZoomAudioAnalyzer:
     def _analyze_audio(self):
         """
         Analyze audio data in real-time.
+        
+        Blocks on the queue instead of polling, then takes every block that is waiting and
+        analyzes the whole batch in one NumPy pass.
         """
         accumulated_frames = []
         last_transcription_time = time.time()
         
         while self.is_recording:
             try:
-                # Get audio chunk from queue
-                if not self.audio_data_queue.empty():
-                    data = self.audio_data_queue.get()
-                    
-                    # Analyze volume
-                    audio_data = np.frombuffer(data, dtype=np.int16)
-                    self.current_volume = np.abs(audio_data).mean()
-                    self.volume_history.append(self.current_volume)
-                    
-                    # Check if there's speech (simple threshold-based detection)
-                    speech_threshold = 1000  # Adjust based on your microphone
-                    self.is_speech_active = self.current_volume > speech_threshold
-                    self.speech_activity_history.append(1 if self.is_speech_active else 0)
-                    
-                    # Print info every second
-                    if len(self.volume_history) % 16 == 0:
-                        print(f"Current volume: {self.current_volume:.2f}, "
-                              f"Speech active: {self.is_speech_active}")
-                    
-                    # Accumulate frames for speech recognition
-                    accumulated_frames.append(data)
-                    
-                    # Perform speech recognition every 3 seconds
-                    current_time = time.time()
-                    if current_time - last_transcription_time > 3 and self.is_speech_active:
-                        # Create a WAV file in memory from accumulated frames
-                        recognizer_thread = threading.Thread(
-                            target=self._recognize_speech,
-                            args=(accumulated_frames.copy(),)
-                        )
-                        recognizer_thread.daemon = True
-                        recognizer_thread.start()
-                        
-                        # Reset for next analysis
-                        accumulated_frames = []
-                        last_transcription_time = current_time
+                # Wait for audio, waking up periodically to notice when recording stops
+                try:
+                    batch = [self.audio_data_queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                while True:
+                    try:
+                        batch.append(self.audio_data_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                metrics.QUEUE_DEPTH.observe(len(batch), queue="analysis")
+                volume_started = time.perf_counter()
+                
+                # Analyze volume of every block at once
+                audio_data = np.frombuffer(b''.join(batch), dtype=np.int16)
+                block_starts = np.cumsum([0] + [len(data) // 2 for data in batch[:-1]])
+                volumes = np.add.reduceat(np.abs(audio_data.astype(np.int32)), block_starts)
+                volumes = volumes / np.diff(np.append(block_starts, len(audio_data)))
                 
-                time.sleep(0.01)  # Small delay to prevent CPU overuse
+                # Check if there's speech (simple threshold-based detection)
+                active = volumes > self.speech_threshold
+                blocks_before = self.volume_history.total
+                self.volume_history.extend(volumes)
+                self.speech_activity_history.extend(active)
+                self.volume_archive.extend(volumes)
+                self.speech_activity_archive.extend(active)
+                self.current_volume = volumes[-1]
+                self.is_speech_active = bool(active[-1])
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - volume_started, stage="analyzer_volume")
+                
+                # Print info every 16 blocks (about a second at the defaults)
+                if self.volume_history.total // 16 != blocks_before // 16:
+                    print(f"Current volume: {self.current_volume:.2f}, "
+                          f"Speech active: {self.is_speech_active}")
+                
+                # Keep the spectral features up to date so stopping doesn't need a full reanalysis
+                self._update_features(audio_data)
+                
+                # Accumulate frames for speech recognition
+                accumulated_frames.extend(batch)
+                
+                # Perform speech recognition every 3 seconds
+                current_time = time.time()
+                if current_time - last_transcription_time > 3 and self.is_speech_active:
+                    self._submit_recognition(accumulated_frames)
+                    
+                    # Reset for next analysis
+                    accumulated_frames = []
+                    last_transcription_time = current_time
                 
             except Exception as e:
                 print(f"Error during analysis: {e}")
                 time.sleep(0.1)
 
+    def _update_features(self, audio_data):
+        """
+        Feed captured int16 audio (bytes or array) to the live feature extractor.
+        
+        Args:
+            audio_data: Interleaved 16-bit samples
+        """
+        if isinstance(audio_data, bytes):
+            audio_data = np.frombuffer(audio_data, dtype=np.int16)
+        with metrics.STAGE_SECONDS.time(stage="analyzer_features"):
+            samples = audio_data.reshape(-1, self.channels).mean(axis=1, dtype=np.float32) / 32768.0
+            self.feature_extractor.update(samples)
+
+    def _submit_recognition(self, frames):
+        """
+        Hand frames to the recognition executor, unless too much work is already pending.
+        
+        Args:
+            frames: List of audio frames
+        """
+        if not self.recognition_slots.acquire(blocking=False):
+            self.skipped_recognitions += 1
+            print("Speech recognition is falling behind, skipping this segment")
+            return
+        
+        future = self.recognition_executor.submit(self._recognize_speech, frames)
+        future.add_done_callback(lambda _: self.recognition_slots.release())
+
     def _recognize_speech(self, frames):
         """
         Perform speech recognition on accumulated frames.
@@ -230,93 +320,55 @@ class ZoomAudioAnalyzer:
             frames: List of audio frames
         """
         try:
-            # Create a WAV file in memory
+            # Hand the raw PCM to the recognizer directly, no temporary WAV file
             audio_data = b''.join(frames)
+            audio = sr.AudioData(audio_data, self.rate, self.p.get_sample_size(self.format))
             
-            # Create a temporary WAV file
-            temp_filename = os.path.join(self.output_dir, "temp_recognition.wav")
-            
-            wf = wave.open(temp_filename, 'wb')
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.p.get_sample_size(self.format))
-            wf.setframerate(self.rate)
-            wf.writeframes(audio_data)
-            wf.close()
-            
-            # Use speech recognition
-            with sr.AudioFile(temp_filename) as source:
-                audio = self.recognizer.record(source)
+            started = time.perf_counter()
+            try:
+                text = self.recognizer.recognize_google(audio)
+                self.speech_text = text
+                print(f"Recognized: {text}")
                 
-                try:
-                    text = self.recognizer.recognize_google(audio)
-                    self.speech_text = text
-                    print(f"Recognized: {text}")
-                    
-                    # Here you can perform topic detection or other analysis on the text
-                    
-                except sr.UnknownValueError:
-                    pass  # Speech wasn't understandable
-                except sr.RequestError as e:
-                    print(f"Could not request results; {e}")
+                # Here you can perform topic detection or other analysis on the text
+                
+            except sr.UnknownValueError:
+                pass  # Speech wasn't understandable
+            except sr.RequestError as e:
+                print(f"Could not request results; {e}")
             
-            # Clean up temp file
-            os.remove(temp_filename)
+            elapsed = time.perf_counter() - started
+            duration = len(frames) * self.chunk / self.rate
+            metrics.STAGE_SECONDS.observe(elapsed, stage="analyzer_recognition")
+            metrics.MODEL_RTF.observe(elapsed / duration, model="google")
             
         except Exception as e:
             print(f"Error in speech recognition: {e}")
 
-    def _analyze_saved_file(self, filename):
+    def _analyze_saved_file(self, filename, extractor=None):
         """
         Perform comprehensive analysis on a saved audio file.
         
         Args:
             filename: Path to the audio file
+            extractor: FeatureExtractor already fed with the whole recording, if available;
+                otherwise the file is streamed from disk in blocks
         """
         try:
             print(f"Analyzing {filename}...")
             
-            # Load audio file
-            y, sr = librosa.load(filename, sr=None)
-            
-            # Extract features
-            # 1. Spectral Centroid
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            
-            # 2. Zero Crossing Rate
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(y)[0]
-            
-            # 3. MFCC (Mel-Frequency Cepstral Coefficients)
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            # 4. Spectral Contrast
-            spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-            
-            # Generate plots
-            plt.figure(figsize=(15, 10))
-            
-            # Plot waveform
-            plt.subplot(3, 1, 1)
-            librosa.display.waveshow(y, sr=sr)
-            plt.title('Waveform')
-            
-            # Plot spectrogram
-            plt.subplot(3, 1, 2)
-            D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
-            librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log')
-            plt.colorbar(format='%+2.0f dB')
-            plt.title('Spectrogram')
+            # Spectral centroid, zero crossing rate, MFCCs and spectral contrast all come
+            # from one STFT pass
+            if extractor is None:
+                extractor = extract_file(filename)
             
-            # Plot MFCCs
-            plt.subplot(3, 1, 3)
-            librosa.display.specshow(mfccs, sr=sr, x_axis='time')
-            plt.colorbar()
-            plt.title('MFCCs')
+            features_filename = filename.replace('.wav', '_features.npz')
+            extractor.save(features_filename)
+            print(f"Features saved to {features_filename}")
             
-            # Save plot
+            # Generate plots: waveform, spectrogram, MFCCs
             analysis_filename = filename.replace('.wav', '_analysis.png')
-            plt.tight_layout()
-            plt.savefig(analysis_filename)
-            plt.close()
+            extractor.plot(analysis_filename)
             
             print(f"Analysis saved to {analysis_filename}")
             
@@ -376,6 +428,7 @@ class ZoomAudioAnalyzer:
         Clean up resources.
         """
         self.is_recording = False
+        self.recognition_executor.shutdown(wait=False)
         self.p.terminate()
         print("Audio analyzer resources cleaned up.")
 
@@ -405,12 +458,12 @@ class ZoomAudioAnalyzer:
         
         def update_plot(frame):
             # Update volume history plot
-            x = range(len(self.volume_history[-100:]) if len(self.volume_history) > 100 else len(self.volume_history))
-            y = self.volume_history[-100:] if len(self.volume_history) > 100 else self.volume_history
+            y = self.volume_history.recent(100)
+            x = range(len(y))
             volume_line.set_data(x, y)
             
             # Update speech activity plot
-            y_speech = self.speech_activity_history[-100:] if len(self.speech_activity_history) > 100 else self.speech_activity_history
+            y_speech = self.speech_activity_history.recent(len(y))
             speech_line.set_data(x, y_speech)
             
             # Adjust axes if needed
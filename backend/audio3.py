@@ -1,12 +1,22 @@
-import whisper
-import pyaudio
+import queue
 import numpy as np
-import tempfile
-import wave
+import pyaudio
+import audio_utils
+import model_registry
+from governor import ModelGovernor, MODELS
+from streaming import StreamingTranscriber
 
 # Audio recording parameters
 RATE = 44100  # Sample rate (matches Zoom's output)
 CHUNK = 1024  # Buffer size
+CHANNELS = 2  # Stereo capture
+TARGET_RATE = 16000  # Audio is downmixed and resampled to this rate as it is captured
+MODEL_NAME = "base"  # Use "tiny", "base", "small", "medium", or "large"
+ADAPTIVE_MODEL = True  # Start with MODEL_NAME, then switch between governor.MODELS as decode speed allows
+MAX_BACKLOG_SECONDS = 5.0  # Undecoded audio that makes the governor switch to a faster model
+CPU_PROFILE = False  # On CPU-only hosts: int8 models and torch threads pinned for the one decoder (see model_registry)
+STEP_SECONDS = 1.0  # How often the window is re-decoded (latency of partial text)
+MAX_WINDOW_SECONDS = 20.0  # Text is force-committed before the window grows past this
 
 def list_input_devices():
     """List all available audio input devices."""
@@ -17,52 +27,76 @@ def list_input_devices():
         print(f"{i}: {info['name']}")
     p.terminate()
 
-def save_audio_to_wav(audio_data, rate):
-    """Save audio data to a temporary WAV file."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_wav:
-        with wave.open(temp_wav.name, 'wb') as wf:
-            wf.setnchannels(1)  # Mono audio
-            wf.setsampwidth(2)  # 16-bit audio
-            wf.setframerate(rate)
-            wf.writeframes(audio_data)
-        return temp_wav.name
+def _drain(audio_queue):
+    """Yield all audio captured since the last call, waiting for at least one block."""
+    while True:
+        blocks = [audio_queue.get()]
+        while True:
+            try:
+                blocks.append(audio_queue.get_nowait())
+            except queue.Empty:
+                break
+        yield audio_utils.pcm16_to_float32(np.concatenate(blocks)[:, 0])
+
+def transcribe_zoom_audio(device_index=None, on_segment=None):
+    """
+    Capture audio from Zoom and transcribe it in real-time using Whisper.
 
-def transcribe_zoom_audio(device_index=None):
-    """Capture audio from Zoom and transcribe it in real-time using Whisper."""
+    Capture runs in PyAudio's callback thread, so decoding never blocks reading the device.
+    Partial text is printed as it changes and final text once it stops changing.
+    """
     if device_index is None:
         print("Error: Please provide a valid input device index.")
         list_input_devices()
         return
 
-    # Load the Whisper model
-    model = whisper.load_model("base")  # Use "tiny", "base", "small", "medium", or "large"
+    if CPU_PROFILE:
+        model_registry.enable_cpu_profile(1)
+
+    converter = audio_utils.CaptureConverter(RATE, CHANNELS, TARGET_RATE)
+    audio_queue = queue.Queue()
+
+    def on_audio(in_data, frame_count, time_info, status):
+        # Downmix and resample in memory, no temporary WAV file
+        audio_queue.put(converter.process(in_data))
+        return (None, pyaudio.paContinue)
+
+    governor = None
+    if ADAPTIVE_MODEL and MODEL_NAME in MODELS:
+        # Audio still waiting in the queue is what decoding hasn't caught up with
+        governor = ModelGovernor(MODELS, MODEL_NAME,
+                                 backlog=lambda: audio_queue.qsize() * CHUNK / RATE,
+                                 max_backlog_seconds=MAX_BACKLOG_SECONDS,
+                                 upgrade_backlog_seconds=STEP_SECONDS)
+
+    transcriber = StreamingTranscriber(MODEL_NAME,
+                                       step_seconds=STEP_SECONDS,
+                                       max_buffer_seconds=MAX_WINDOW_SECONDS,
+                                       on_segment=on_segment,
+                                       governor=governor)
 
     # Initialize PyAudio for capturing audio
     p = pyaudio.PyAudio()
     stream = p.open(
         format=pyaudio.paInt16,  # 16-bit audio format
-        channels=2,             # Stereo audio
+        channels=CHANNELS,      # Stereo audio
         rate=RATE,              # Sampling rate
         input=True,             # Enable input stream
         input_device_index=device_index,
-        frames_per_buffer=CHUNK
+        frames_per_buffer=CHUNK,
+        stream_callback=on_audio
     )
 
     print(f"Listening for audio from device index {device_index}... Press Ctrl+C to stop.")
 
     try:
-        while True:
-            # Read audio data
-            audio_data = stream.read(CHUNK)
-
-            # Save audio to a temporary WAV file
-            wav_path = save_audio_to_wav(audio_data, RATE)
-
-            # Transcribe audio using Whisper
-            result = model.transcribe(wav_path, fp16=False)
-            print(f"Transcript: {result['text']}")
+        for segment in transcriber.stream(_drain(audio_queue)):
+            label = "Final" if segment["final"] else "Partial"
+            print(f"[{segment['start']:7.2f} - {segment['end']:7.2f}] {label} ({segment['model']}): {segment['text']}")
     except KeyboardInterrupt:
         print("Exiting...")
+        for segment in transcriber.finish():
+            print(f"[{segment['start']:7.2f} - {segment['end']:7.2f}] Final: {segment['text']}")
     finally:
         # Clean up resources
         stream.stop_stream()
@@ -1,17 +1,56 @@
+import importlib
 import os
-import pyaudio
-import wave
-import whisper
+import re
+import threading
+import time
+import vad
+import numpy as np
+import audio_utils
+import batching
+import governor
+import journal
+import metrics
+import model_registry
+import transcription_cache
+from archiver import WavArchiver, read_wav
+from capture import AudioCapture
+from chunker import AdaptiveChunker
+from pipeline import TranscriptionPipeline, CancellationToken, DROP_OLDEST
+from transcript_writer import TranscriptWriter, FORMATS
 
-# Audio recording parameters
-FORMAT = pyaudio.paInt16
+# Audio recording parameters (16-bit samples, see capture.py)
 CHANNELS = 2
 RATE = 44100
 CHUNK = 1024
-CHUNK_DURATION = 2 * 60  # 2 minutes in seconds for testing
+TARGET_RATE = 16000  # Captured audio is stored at Whisper's native rate...
+TARGET_CHANNELS = 1  # ...and downmixed to mono before it is queued or archived
+MIN_CHUNK_SECONDS = 10  # Chunks are cut at the first pause after this many seconds...
+MAX_CHUNK_SECONDS = 30  # ...or at the quietest point if nobody pauses for this long
+MODEL_NAME = "base"  # Use "tiny", "base", "small", "medium", or "large"
+ADAPTIVE_MODEL = True  # Start with MODEL_NAME, then switch between governor.MODELS as speed and backlog allow
+DEVICE_INDEX = 2  # Replace with the correct device index for VB-Audio Virtual Cable
+NUM_WORKERS = 2  # Transcription worker threads
+BATCH_INFERENCE = True  # Decode chunks waiting in any worker/session together (see batching.py)
+MAX_BATCH_SIZE = 4  # 30-second windows per batch; also the minimum number of workers when batching
+MAX_BATCH_WAIT_SECONDS = 0.5  # How long a chunk may wait for others to fill its batch
+MAX_QUEUED_CHUNKS = 4  # Chunks waiting for a worker before the overflow policy kicks in
+OVERFLOW_POLICY = DROP_OLDEST
+ARCHIVE_CHUNKS = True  # Also save each chunk as a WAV file (written in the background)
+SKIP_SILENCE = True  # Don't send silent audio to the model, trim silence around speech
+CACHE_TRANSCRIPTIONS = True  # Reuse results for audio already transcribed (see transcription_cache.py)
+CPU_PROFILE = False  # On CPU-only hosts: int8 models and torch threads split between workers (see model_registry)
+READ_SECONDS = 0.1  # How much new audio the chunker waits for before analyzing it
+TRANSCRIPT_FORMATS = FORMATS  # Session transcripts kept up to date as chunks finish
+
+_governor = None
+_inference_configured = False
+_configure_lock = threading.Lock()
+_pipelines = {}  # Running pipeline -> its output_dir; the governor watches their queued audio
+_lock = threading.Lock()
 
 def list_input_devices():
     """List all available audio input devices."""
+    import pyaudio
     p = pyaudio.PyAudio()
     print("Available audio input devices:\n")
     for i in range(p.get_device_count()):
@@ -19,58 +58,334 @@ def list_input_devices():
         print(f"{i}: {info['name']}")
     p.terminate()
 
+def worker_count():
+    """Transcription workers to run; with batching, enough to fill a batch (they mostly wait)."""
+    return max(NUM_WORKERS, MAX_BATCH_SIZE) if BATCH_INFERENCE else NUM_WORKERS
+
+def batch_scheduler(model_name=None):
+    """The shared batching scheduler for a model (default: the current one) with this module's batch settings."""
+    return batching.get_scheduler(model_name or current_model(), MAX_BATCH_SIZE, MAX_BATCH_WAIT_SECONDS)
+
+def model_governor():
+    """The ModelGovernor shared by all pipelines, created on first use."""
+    global _governor
+    with _lock:
+        if _governor is None:
+            models = governor.MODELS if MODEL_NAME in governor.MODELS else (MODEL_NAME,)
+            _governor = governor.ModelGovernor(models, MODEL_NAME, backlog=_queued_seconds)
+        return _governor
+
+def configure_inference():
+    """Apply CPU_PROFILE before the first model is loaded; later calls do nothing."""
+    global _inference_configured
+    with _configure_lock:  # Callers racing the first one wait until it is applied
+        if _inference_configured:
+            return
+        if CPU_PROFILE:
+            # With batching, all decoding happens on the scheduler thread
+            model_registry.enable_cpu_profile(1 if BATCH_INFERENCE else worker_count())
+        _inference_configured = True
+
+def preload():
+    """
+    Import the capture and signal processing dependencies and apply CPU_PROFILE.
+
+    They are otherwise imported by the first recording; the server calls this on its
+    warm-up thread so that /start doesn't wait for them.
+    """
+    # Imported only for the side effect of loading them now; capture.py etc. import them again
+    for module in ("pyaudio", "scipy.ndimage", "scipy.signal"):
+        importlib.import_module(module)
+    configure_inference()
+
+def current_model():
+    """Model the next chunk is transcribed with."""
+    return model_governor().current if ADAPTIVE_MODEL else MODEL_NAME
+
+def _queued_seconds():
+    """Audio waiting for a transcription worker, over all running pipelines."""
+    with _lock:
+        pipelines = list(_pipelines)
+    return sum(pipeline.queued_seconds for pipeline in pipelines)
+
+def create_pipeline(first_chunk_number=1, device_index=DEVICE_INDEX, segment_log=None,
+                    output_dir="audio_chunks", worker_pool=None, session_id=None):
+    """
+    Create a pipeline that records chunks continuously and transcribes them in the background.
+
+    If segment_log (a segment_log.SegmentLog) is given, every transcribed segment is also
+    appended to it in order, for live clients, labelled with session_id. With a
+    worker_pool (pipeline.SharedWorkerPool), transcription runs on the pool's shared workers
+    instead of NUM_WORKERS threads of this pipeline's own.
+
+    Chunk progress is journaled in output_dir (see journal.py). If an earlier run in the
+    same directory died, numbering resumes after its last chunk and its unfinished chunks
+    are transcribed again from their WAVs into a separate recovered_* transcript. Chunks a
+    still-running pipeline of the same directory is finishing are left to it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    configure_inference()
+    archiver = WavArchiver() if ARCHIVE_CHUNKS else None
+    gate = vad.SpeechGate(TARGET_RATE) if SKIP_SILENCE else None
+    session_name = time.strftime("session_%Y%m%d_%H%M%S")
+    on_segments = None
+    if segment_log is not None:
+        on_segments = lambda segments: segment_log.extend(segments, session_id or session_name)
+
+    journal_path = os.path.join(output_dir, journal.JOURNAL_NAME)
+    next_number, unfinished = journal.replay(journal_path)
+    with _lock:
+        busy = os.path.abspath(output_dir) in _pipelines.values()
+    if busy and unfinished:
+        # A stopped pipeline is still transcribing these; they aren't left over from a crash
+        print(f"Not recovering {len(unfinished)} chunks in {output_dir}: another pipeline is still finishing them")
+        unfinished = []
+    first_chunk_number = max(first_chunk_number, next_number, _next_unused_chunk_number(output_dir))
+    session_journal = journal.SessionJournal(journal_path)
+    failed = set()  # Chunks not to journal WRITTEN: failed or dropped recoveries (left for a restart) and lost ones
+
+    def chunk_written(chunk_number):
+        if chunk_number not in failed:
+            session_journal.record(journal.WRITTEN, chunk_number)
+
+    writer = TranscriptWriter(os.path.join(output_dir, session_name), TRANSCRIPT_FORMATS, first_chunk_number,
+                              on_segments, chunk_written)
+    recovered = []
+    for record in unfinished:
+        if record["wav"] and os.path.exists(record["wav"]):
+            recovered.append(record)  # Unreadable or truncated WAVs are marked LOST by load_recovered()
+        else:
+            print(f"Can't recover chunk {record['chunk']}: its WAV was never archived")
+            session_journal.record(journal.LOST, record["chunk"])
+    recovery_writer = None
+    if recovered:
+        print(f"Recovering {len(recovered)} unfinished chunks in {output_dir}")
+        recovered_numbers = [record["chunk"] for record in recovered]
+        recovery_writer = TranscriptWriter(os.path.join(output_dir, "recovered_" + session_name[len("session_"):]),
+                                           TRANSCRIPT_FORMATS, recovered_numbers[0], on_segments, chunk_written)
+        for number in set(range(recovered_numbers[0], recovered_numbers[-1])) - set(recovered_numbers):
+            recovery_writer.skip(number)  # Finished in the earlier run
+
+    def writer_for(chunk_number):
+        return writer if chunk_number >= first_chunk_number else recovery_writer
+
+    capture = open_capture(device_index)
+    cancel_token = CancellationToken()  # Cancelled by pipeline.stop() to end the current chunk early
+    chunks = record_chunks(capture, cancel_token)
+
+    def capture_chunk(chunk_number):
+        item = next(chunks, None)
+        if item is None:
+            return None  # Capture was cancelled and the partial chunk already delivered
+        samples, start = item
+        duration = len(samples) / TARGET_RATE
+        print(f"Recorded chunk {chunk_number} ({start:.2f}s - {start + duration:.2f}s)")
+        # Chunk offsets let per-chunk timestamps be stitched into one session timeline
+        with open(os.path.join(output_dir, "chunks.tsv"), 'a', encoding='utf-8') as boundaries:
+            boundaries.write(f"{chunk_number}\t{start:.3f}\t{start + duration:.3f}\n")
+        session_journal.record(journal.CAPTURED, chunk_number, start=round(start, 3),
+                               end=round(start + duration, 3))
+        if archiver is not None:
+            # Only journaled once the WAV is complete on disk, so recovery never trusts a partial file
+            wav = os.path.join(output_dir, f"chunk_{chunk_number}.wav")
+            archiver.submit(wav, samples, TARGET_RATE,
+                            lambda: session_journal.record(journal.ARCHIVED, chunk_number, wav=wav))
+        return samples, duration, start
+
+    def finish():
+        with _lock:
+            _pipelines.pop(pipeline, None)
+        chunks.close()
+        if archiver is not None:
+            archiver.close()
+        writer.close()
+        if recovery_writer is not None:
+            recovery_writer.close()
+        session_journal.close()
+
+    def extra_stats():
+        stats = capture.stats()
+        if gate is not None:
+            stats.update(gate.stats())
+        if BATCH_INFERENCE:
+            stats.update(batch_scheduler().stats())
+        if CACHE_TRANSCRIPTIONS:
+            stats.update(transcription_cache.get_cache().stats())
+        if ADAPTIVE_MODEL:
+            stats.update(model_governor().stats())
+        return stats
+
+    def transcribe_chunk(chunk):
+        samples, trim_offset = chunk.audio, 0.0
+        if gate is not None:
+            with metrics.STAGE_SECONDS.time(stage="vad"):
+                samples, trim_offset = gate.process(samples)
+            if samples is None:
+                print(f"No speech in chunk {chunk.number}, skipping transcription")
+                writer_for(chunk.number).skip(chunk.number)
+                return
+        started = time.perf_counter()
+        try:
+            with metrics.STAGE_SECONDS.time(stage="convert"):
+                audio = audio_utils.to_whisper_audio(samples, TARGET_RATE, TARGET_CHANNELS)
+            result = transcribe_audio(audio, chunk.number, output_dir)
+        except Exception:
+            failed.add(chunk.number)
+            writer_for(chunk.number).skip(chunk.number)
+            raise
+        if gate is not None:
+            gate.record_inference(len(samples) / TARGET_RATE, time.perf_counter() - started)
+        session_journal.record(journal.TRANSCRIBED, chunk.number)
+        with metrics.STAGE_SECONDS.time(stage="transcript_write"):
+            writer_for(chunk.number).add(chunk.number, result['segments'], chunk.start + trim_offset,
+                                         result.get('language'))
+
+    def dropped(chunk):
+        if chunk.number < first_chunk_number:
+            # A recovered chunk evicted by live audio: leave it unfinished so a restart retries its WAV
+            print(f"Recovered chunk {chunk.number} will be transcribed again on the next start")
+            failed.add(chunk.number)
+        else:
+            session_journal.record(journal.DROPPED, chunk.number)
+        writer_for(chunk.number).skip(chunk.number)
+
+    def load_recovered():
+        """Read unfinished chunks of the earlier run back from their WAVs, one at a time."""
+        for record in recovered:
+            try:
+                samples, rate = read_wav(record["wav"])
+            except Exception as e:
+                print(f"Can't recover chunk {record['chunk']} from {record['wav']}: {e}")
+                session_journal.record(journal.LOST, record["chunk"])
+                failed.add(record["chunk"])  # Already finished as LOST; the skip mustn't journal it WRITTEN
+                recovery_writer.skip(record["chunk"])
+                continue
+            if rate != TARGET_RATE or samples.shape[1] != TARGET_CHANNELS:
+                converter = audio_utils.CaptureConverter(rate, samples.shape[1], TARGET_RATE, TARGET_CHANNELS)
+                samples = np.concatenate((converter.process(samples), converter.flush()))
+            yield record["chunk"], samples, len(samples) / TARGET_RATE, record["start"]
+
+    pipeline = TranscriptionPipeline(capture_chunk, transcribe_chunk,
+                                     num_workers=worker_count(),
+                                     max_queued_chunks=MAX_QUEUED_CHUNKS,
+                                     overflow_policy=OVERFLOW_POLICY,
+                                     first_chunk_number=first_chunk_number,
+                                     on_stop=finish,
+                                     extra_stats=extra_stats,
+                                     on_drop=dropped,
+                                     worker_pool=worker_pool,
+                                     cancel_token=cancel_token,
+                                     backlog=load_recovered() if recovered else None)
+    with _lock:
+        _pipelines[pipeline] = os.path.abspath(output_dir)
+    return pipeline
+
+def _next_unused_chunk_number(output_dir):
+    """One past the highest chunk_N file already in output_dir, so old files are never overwritten."""
+    numbers = [int(match.group(1)) for match in
+               (re.match(r"chunk_(\d+)\.(wav|txt)$", name) for name in os.listdir(output_dir)) if match]
+    return max(numbers, default=0) + 1
+
 def record_audio(is_recording_ref, chunk_number_ref):
-    """Record audio in chunks."""
-    device_index = 2  # Replace with the correct device index for VB-Audio Virtual Cable
-    os.makedirs("audio_chunks", exist_ok=True)
-
-    while is_recording_ref[0]:
-        chunk_filename = f"audio_chunks/chunk_{chunk_number_ref[0]}.wav"
-        record_audio_chunk(chunk_filename, device_index, CHUNK_DURATION)
-        transcribe_audio(chunk_filename, chunk_number_ref[0])  # Transcribe after recording
-        chunk_number_ref[0] += 1
-
-def record_audio_chunk(output_filename, device_index, record_seconds):
-    """Record a chunk of audio and save it to a file."""
-    p = pyaudio.PyAudio()
-    stream = p.open(format=FORMAT,
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    input_device_index=device_index,
-                    frames_per_buffer=CHUNK)
-
-    frames = []
-    print(f"Recording chunk: {output_filename}...")
+    """Record audio in chunks until is_recording_ref[0] is cleared, transcribing in parallel."""
+    pipeline = create_pipeline(chunk_number_ref[0])
+    pipeline.start()
+    while is_recording_ref[0] and pipeline.is_running:
+        time.sleep(0.5)
+    pipeline.stop()
+    chunk_number_ref[0] = pipeline.next_chunk_number
+
+def open_capture(device_index=DEVICE_INDEX):
+    """Create the long-lived capture stream for the configured device and formats."""
+    return AudioCapture(device_index, RATE, CHANNELS, CHUNK, TARGET_RATE, TARGET_CHANNELS)
+
+def record_chunks(capture, cancel_token=None):
+    """
+    Record continuously and yield (samples, start_seconds) chunks cut at pauses.
+
+    Samples are int16 of shape (frames, TARGET_CHANNELS) at TARGET_RATE. The chunker looks
+    at views of the capture ring buffer; only finished chunks are copied out of it. When
+    cancel_token (a pipeline.CancellationToken) is cancelled, the device is closed within
+    about READ_SECONDS, the partial chunk is yielded and the generator ends.
+    """
+    chunker = AdaptiveChunker(capture.target_rate, MIN_CHUNK_SECONDS, MAX_CHUNK_SECONDS)
+    step = int(READ_SECONDS * capture.target_rate)
+    position = 0
+    capture.start()
     try:
-        for _ in range(0, int(RATE / CHUNK * record_seconds)):
-            data = stream.read(CHUNK)
-            frames.append(data)
-    except KeyboardInterrupt:
-        print("\nRecording interrupted by user.")
-
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+        while True:
+            cancelled = cancel_token is not None and cancel_token.cancelled
+            if cancelled:
+                capture.close()  # Flushes the resampler tail into the ring
+                available = capture.frames_written
+            else:
+                available = capture.wait_for(position + step, timeout=2 * READ_SECONDS)
+            ranges = []
+            if available > position:
+                new_audio = capture.read(position, available)
+                lost = (available - position) - len(new_audio)
+                if lost:
+                    # We fell more than the ring's length behind; keep the timeline intact
+                    print(f"Capture ring overrun, {lost / capture.target_rate:.2f}s of audio lost")
+                    chunker.feed(np.zeros((lost, capture.target_channels), dtype=np.int16))
+                with metrics.STAGE_SECONDS.time(stage="chunking"):
+                    ranges = chunker.feed(new_audio)
+                position = available
+            if cancelled:
+                ranges.append(chunker.flush_range())
+            for start, end in filter(None, ranges):
+                yield np.array(capture.read(start, end)), start / capture.target_rate
+            if cancelled:
+                return
+    finally:
+        capture.close()
+
+def _run_model(audio, model_name):
+    """Transcribe with the batching scheduler or directly with the shared model (one call at a time)."""
+    started = time.perf_counter()
+    if BATCH_INFERENCE and not isinstance(audio, str):
+        result = batch_scheduler(model_name).transcribe(audio)
+    else:
+        model = model_registry.get_model(model_name)  # Loaded once and shared across chunks
+        result = model_registry.transcribe(model, audio)
+    finished = time.perf_counter()
+    metrics.STAGE_SECONDS.observe(finished - started, stage="inference")
+    if not isinstance(audio, str) and len(audio):
+        seconds = len(audio) / TARGET_RATE
+        metrics.MODEL_RTF.observe((finished - started) / seconds, model=model_name)
+        if ADAPTIVE_MODEL:
+            model_governor().record(model_name, seconds, started, finished)
+    return result
 
-    with wave.open(output_filename, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+def transcribe_audio(audio, chunk_number, output_dir="audio_chunks"):
+    """
+    Transcribe audio using Whisper and save the transcription to a text file.
 
-    print(f"Saved chunk to {output_filename}")
+    audio is either a file path or a float32 16 kHz mono array (see audio_utils.to_whisper_audio).
 
-def transcribe_audio(file_path, chunk_number):
-    """Transcribe audio using Whisper and save the transcription to a text file."""
-    print(f"Transcribing {file_path}...")
-    model = whisper.load_model("base")  # Use "tiny", "base", "small", "medium", or "large"
-    result = model.transcribe(file_path)
+    Returns:
+        dict: Whisper's result, with segment times relative to the start of `audio`, and the
+            "model" that produced it (also set on every segment)
+    """
+    model_name = current_model()
+    print(f"Transcribing chunk {chunk_number} with model '{model_name}'...")
+    if isinstance(audio, str) or not CACHE_TRANSCRIPTIONS:
+        result = _run_model(audio, model_name)
+    else:
+        # Identical audio (a retried or re-run chunk) is answered from the cache
+        options = {"task": "transcribe", "batched": BATCH_INFERENCE,
+                   "precision": model_registry.default_precision()}
+        result = transcription_cache.transcribe_cached(audio, model_name, options,
+                                                       lambda: _run_model(audio, model_name))
+    result["model"] = model_name
+    for segment in result["segments"]:
+        segment["model"] = model_name  # Kept in the session transcript and the live segment log
     transcription = result['text']
     print(f"Transcription for chunk {chunk_number}:\n{transcription}")
 
     # Save transcription to a text file
-    text_filename = f"audio_chunks/chunk_{chunk_number}.txt"
-    with open(text_filename, 'w', encoding='utf-8') as text_file:
+    text_filename = os.path.join(output_dir, f"chunk_{chunk_number}.txt")
+    with metrics.STAGE_SECONDS.time(stage="save_text"), open(text_filename, 'w', encoding='utf-8') as text_file:
         text_file.write(transcription)
-    print(f"Saved transcription to {text_filename}")
\ No newline at end of file
+    print(f"Saved transcription to {text_filename}")
+    return result
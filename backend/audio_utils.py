@@ -0,0 +1,193 @@
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WHISPER_RATE = 16000  # Whisper expects 16 kHz mono float32 in [-1, 1]
+
+
+def pcm16_to_array(data, channels=1):
+    """
+    Interpret raw 16-bit PCM as an int16 array of shape (frames, channels).
+
+    Args:
+        data: bytes, a list of bytes blocks as read from a stream, or an int16 array
+        channels: Number of interleaved channels in the data
+    """
+    if isinstance(data, np.ndarray):
+        samples = data
+    else:
+        if isinstance(data, (list, tuple)):
+            data = b''.join(data)
+        samples = np.frombuffer(data, dtype=np.int16)
+    return samples.reshape(-1, channels)
+
+
+def pcm16_to_float32(samples):
+    """Scale int16 samples to float32 in [-1, 1] without leaving NumPy."""
+    return samples.astype(np.float32) * (1.0 / 32768.0)
+
+
+def downmix(samples):
+    """Average a (frames, channels) array down to mono (frames,)."""
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def resample(samples, orig_rate, target_rate):
+    """Resample a mono float32 signal with a polyphase filter."""
+    if orig_rate == target_rate:
+        return samples
+    from scipy.signal import resample_poly  # Deferred: scipy is slow to import
+    divisor = gcd(orig_rate, target_rate)
+    return resample_poly(samples, target_rate // divisor, orig_rate // divisor).astype(np.float32)
+
+
+def to_whisper_audio(data, rate, channels=1):
+    """
+    Convert captured 16-bit PCM straight into the array Whisper's transcribe() accepts.
+
+    This replaces the write-WAV-then-decode-with-ffmpeg round trip: no files, no subprocesses.
+
+    Args:
+        data: Captured PCM (bytes, list of bytes blocks, or int16 array)
+        rate: Sample rate of the captured audio
+        channels: Number of interleaved channels in the captured audio
+
+    Returns:
+        np.ndarray: float32 mono audio at 16 kHz
+    """
+    samples = pcm16_to_float32(pcm16_to_array(data, channels))
+    return resample(downmix(samples), rate, WHISPER_RATE)
+
+
+class StreamResampler:
+    def __init__(self, orig_rate, target_rate):
+        """
+        Polyphase resampler that can be fed audio block by block.
+
+        Uses the same Kaiser-windowed FIR filter as scipy.signal.resample_poly, but keeps
+        the filter history between calls so consecutive blocks join without edge artifacts.
+        Each call does one vectorized multiply-accumulate over all output samples of the block.
+
+        Args:
+            orig_rate: Sample rate of the incoming audio
+            target_rate: Sample rate to produce
+        """
+        divisor = gcd(orig_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = orig_rate // divisor
+
+        max_rate = max(self.up, self.down)
+        half_len = 10 * max_rate
+        from scipy.signal import firwin
+        taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * self.up
+        self.delay = half_len
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up, dtype=np.float32)
+        padded[:len(taps)] = taps
+        # phases[p, j] is tap p + j * up, stored reversed so it lines up with a forward window
+        self.phases = padded.reshape(self.taps_per_phase, self.up).T[:, ::-1].copy()
+
+        self._history = None
+        self._history_start = -(self.taps_per_phase - 1)  # Input index of _history[0]
+        self._total_in = 0
+        self._next_out = 0
+
+    def process(self, samples):
+        """
+        Resample the next block.
+
+        Args:
+            samples: float32 array of shape (frames,) or (frames, channels)
+
+        Returns:
+            np.ndarray: Resampled float32 audio with the same number of channels
+        """
+        if self.up == self.down:
+            return samples
+        if self._history is None:
+            self._history = np.zeros((self.taps_per_phase - 1,) + samples.shape[1:], dtype=np.float32)
+        buffer = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        self._total_in += len(samples)
+
+        # Output n needs input up to (n * down + delay) // up, which must already be captured
+        last_out = (self._total_in * self.up - 1 - self.delay) // self.down
+        out_index = np.arange(self._next_out, max(last_out + 1, self._next_out))
+        upsampled = out_index * self.down + self.delay
+        phase = upsampled % self.up
+        newest = upsampled // self.up - self._history_start
+
+        if len(out_index) == 0:
+            # Empty or very short block: nothing to output yet, just remember the input
+            out = np.zeros((0,) + buffer.shape[1:], dtype=np.float32)
+        else:
+            windows = sliding_window_view(buffer, self.taps_per_phase, axis=0)[newest - self.taps_per_phase + 1]
+            if buffer.ndim == 1:
+                out = np.einsum('nk,nk->n', windows, self.phases[phase])
+            else:
+                out = np.einsum('nck,nk->nc', windows, self.phases[phase])
+
+        # Keep only the input the next output sample will still need. That sample may need
+        # input not captured yet, so never keep less than the last taps_per_phase - 1 frames.
+        self._next_out += len(out_index)
+        newest_needed = min((self._next_out * self.down + self.delay) // self.up, self._total_in)
+        keep_from = newest_needed - (self.taps_per_phase - 1)
+        self._history = buffer[keep_from - self._history_start:]
+        self._history_start = keep_from
+        return out.astype(np.float32, copy=False)
+
+    def flush(self):
+        """Return the samples still held back by the filter delay at the end of a stream."""
+        if self._history is None:
+            return np.zeros(0, dtype=np.float32)
+        total_out = -(-self._total_in * self.up // self.down)
+        already_out = self._next_out
+        padding = -(-self.delay // self.up) + 1
+        tail = self.process(np.zeros((padding,) + self._history.shape[1:], dtype=np.float32))
+        self._total_in -= padding
+        return tail[:max(total_out - already_out, 0)]
+
+
+class CaptureConverter:
+    def __init__(self, source_rate, source_channels, target_rate=WHISPER_RATE, target_channels=1):
+        """
+        Convert interleaved int16 capture blocks to the format the rest of the pipeline stores.
+
+        Downmixing happens before resampling so the filter only runs on the channels we keep.
+
+        Args:
+            source_rate: Sample rate of the capture device
+            source_channels: Number of channels captured
+            target_rate: Sample rate to store (default: 16000, what Whisper uses)
+            target_channels: 1 to downmix to mono, or source_channels to keep them
+        """
+        if target_channels not in (1, source_channels):
+            raise ValueError("target_channels must be 1 or equal to source_channels")
+        self.source_rate = source_rate
+        self.source_channels = source_channels
+        self.target_rate = target_rate
+        self.target_channels = target_channels
+        self.resampler = StreamResampler(source_rate, target_rate)
+
+    def process(self, data):
+        """Convert one captured block (bytes or int16 array) to int16 of shape (frames, target_channels)."""
+        samples = pcm16_to_array(data, self.source_channels)
+        if self.source_rate == self.target_rate and self.source_channels == self.target_channels:
+            return samples
+        samples = samples.astype(np.float32)
+        if self.target_channels == 1:
+            samples = downmix(samples)
+        return _to_int16(self.resampler.process(samples), self.target_channels)
+
+    def flush(self):
+        """Return whatever the resampler still holds at the end of a recording."""
+        return _to_int16(self.resampler.flush(), self.target_channels)
+
+
+def _to_int16(samples, channels):
+    """Round float samples in int16 scale back to int16 of shape (frames, channels)."""
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).reshape(-1, channels)
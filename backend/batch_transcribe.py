@@ -0,0 +1,179 @@
+"""
+Transcribe saved recordings in parallel.
+
+Examples:
+    python batch_transcribe.py audio_chunks
+    python batch_transcribe.py "zoom_recordings/*.wav" --model small --workers 4
+    python batch_transcribe.py audio_chunks --int8
+
+Each file gets a .txt and a .json (Whisper's result) next to it. Progress is kept in a
+manifest, so running the same command again after an interruption only does what's left.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm")
+DEFAULT_MANIFEST = "batch_manifest.json"
+
+
+def find_audio_files(inputs):
+    """Expand directories and glob patterns into a sorted list of audio files."""
+    files = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        for path in glob.glob(pattern):
+            if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS):
+                files.add(os.path.abspath(path))
+    return sorted(files, key=_natural_key)
+
+
+def _natural_key(path):
+    """Sort chunk_2 before chunk_10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+
+def load_manifest(path):
+    """Return the manifest dict, or an empty one if it doesn't exist yet."""
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """Write the manifest atomically so an interruption never leaves it half written."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _file_signature(path):
+    """Size and modification time, so a re-recorded file is transcribed again."""
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def init_worker(model_name, threads_per_worker, precision=None):
+    """Load the model once per worker process, with torch threads limited to this worker's share."""
+    import model_registry
+
+    model_registry.configure_cpu_threads(intra_threads=threads_per_worker)
+    model_registry.get_model(model_name, precision=precision)
+
+
+def transcribe_file(path, model_name, precision=None):
+    """
+    Transcribe one file in a worker process and write its .txt and .json outputs.
+
+    Returns:
+        dict: Manifest entry for the file
+    """
+    import whisper
+    import model_registry
+    import transcription_cache
+
+    model = model_registry.get_model(model_name, precision=precision)
+    audio = whisper.load_audio(path)
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+
+    start = time.perf_counter()
+    cache = transcription_cache.get_cache()
+    hits = cache.hits
+    # Same audio under another name (or a re-recorded file with unchanged audio) is a cache hit
+    result = transcription_cache.transcribe_cached(
+        audio, model_name, {"task": "transcribe", "precision": precision or model_registry.default_precision()},
+        lambda: model.transcribe(audio, fp16=model_registry.is_fp16(model)))
+    elapsed = time.perf_counter() - start
+
+    base = os.path.splitext(path)[0]
+    with open(base + ".txt", 'w', encoding='utf-8') as f:
+        f.write(result['text'])
+    with open(base + ".json", 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+    return {
+        "status": "done",
+        "model": model_name,
+        "precision": precision or model_registry.default_precision(),
+        "duration": round(duration, 3),
+        "elapsed": round(elapsed, 3),
+        "rtf": round(elapsed / duration, 3) if duration else None,
+        "output": base + ".txt",
+        "cached": cache.hits > hits,
+    }
+
+
+def run(files, model_name, workers, manifest_path, precision=None):
+    """Transcribe every file not already done according to the manifest."""
+    manifest = load_manifest(manifest_path)
+    entries = manifest["files"]
+
+    pending = []
+    for path in files:
+        entry = entries.get(path)
+        if entry and entry.get("status") == "done" and entry.get("signature") == _file_signature(path):
+            continue
+        pending.append(path)
+
+    print(f"{len(files)} files, {len(files) - len(pending)} already done, {len(pending)} to transcribe")
+    if not pending:
+        return manifest
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    batch_start = time.perf_counter()
+    audio_seconds = 0.0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(model_name, threads_per_worker, precision)) as executor:
+        futures = {executor.submit(transcribe_file, path, model_name, precision): path for path in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entry = future.result()
+                audio_seconds += entry["duration"]
+                print(f"{os.path.basename(path)}: {entry['duration']:.1f}s audio in "
+                      f"{entry['elapsed']:.1f}s (RTF {entry['rtf']})")
+            except Exception as e:
+                entry = {"status": "failed", "error": str(e)}
+                print(f"{os.path.basename(path)}: failed: {e}")
+            entry["signature"] = _file_signature(path)
+            entries[path] = entry
+            save_manifest(manifest, manifest_path)
+
+    wall = time.perf_counter() - batch_start
+    if audio_seconds:
+        print(f"Transcribed {audio_seconds:.1f}s of audio in {wall:.1f}s "
+              f"(overall RTF {wall / audio_seconds:.3f} with {workers} workers)")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe saved recordings in parallel.")
+    parser.add_argument("inputs", nargs="+", help="Audio files, directories or glob patterns")
+    parser.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes, each with its own model (default: half the CPUs)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST,
+                        help=f"Progress file used to resume (default: {DEFAULT_MANIFEST})")
+    parser.add_argument("--int8", action="store_true",
+                        help="Quantize the model's Linear layers to int8 (CPU only; faster, slightly less accurate)")
+    args = parser.parse_args()
+
+    files = find_audio_files(args.inputs)
+    if not files:
+        print("No audio files found.")
+        return
+    run(files, args.model, args.workers, args.manifest, "int8" if args.int8 else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+import model_registry
+from transcript_writer import offset_segments
+
+MAX_BATCH_SIZE = 8  # 30-second windows decoded together
+MAX_WAIT_SECONDS = 0.5  # How long the first window of a batch may wait for others
+TIME_PRECISION = 0.02  # Seconds per Whisper timestamp token
+
+# Same thresholds model.transcribe uses to decide a decode needs temperature fallback
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+_schedulers = {}  # model name -> BatchScheduler
+_lock = threading.Lock()
+
+
+class _Window:
+    """One 30-second (or shorter) piece of a request waiting to be decoded."""
+
+    def __init__(self, audio, offset):
+        self.audio = audio
+        self.offset = offset  # Start of the window in the request's audio, in seconds
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class BatchScheduler:
+    def __init__(self, model_name=model_registry.DEFAULT_MODEL, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_seconds=MAX_WAIT_SECONDS):
+        """
+        Decode audio from many callers in batches on one model.
+
+        Callers (transcription workers of any session) hand in audio with transcribe(). It
+        is cut into 30-second mel windows, which a single scheduler thread collects until
+        max_batch_size are waiting or the oldest has waited max_wait_seconds. The batch goes
+        through the encoder and decoder together, and each caller gets back a result shaped
+        like model.transcribe()'s. All model calls happen on the scheduler thread.
+
+        Windows whose batched decode looks unreliable (the same checks model.transcribe
+        uses) are re-transcribed on their own with model.transcribe's temperature fallback.
+
+        Args:
+            model_name: Whisper model to use (from model_registry)
+            max_batch_size: Windows decoded together (default: MAX_BATCH_SIZE)
+            max_wait_seconds: Deadline for filling a batch (default: MAX_WAIT_SECONDS)
+        """
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._windows = 0
+        self._fallbacks = 0
+        self._thread = threading.Thread(target=self._run, name=f"batch-{model_name}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def transcribe(self, audio):
+        """
+        Transcribe float32 16 kHz mono audio, blocking until its windows are decoded.
+
+        Returns:
+            dict: {"text", "segments", "language"} with times relative to the audio start
+        """
+        from whisper.audio import N_SAMPLES, SAMPLE_RATE
+        windows = [_Window(audio[start:start + N_SAMPLES], start / SAMPLE_RATE)
+                   for start in range(0, max(len(audio), 1), N_SAMPLES)]
+        for window in windows:
+            self._queue.put(window)
+
+        segments = []
+        language = None
+        for window in windows:
+            result = window.future.result()
+            language = language or result["language"]
+            segments.extend(result["segments"])
+        for i, segment in enumerate(segments):
+            segment["id"] = i
+        return {"text": "".join(segment["text"] for segment in segments),
+                "segments": segments, "language": language}
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "batched_windows": self._windows,
+                "avg_batch_size": round(self._windows / self._batches, 2) if self._batches else 0.0,
+                "batch_fallbacks": self._fallbacks,
+                "batch_queue_depth": self._queue.qsize(),
+            }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0].queued_at + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            metrics.QUEUE_DEPTH.observe(self._queue.qsize(), queue="batch")
+            try:
+                with metrics.STAGE_SECONDS.time(stage="batch_decode"):
+                    results = self._decode(batch)
+            except Exception as e:
+                for window in batch:
+                    window.future.set_exception(e)
+                continue
+            for window, result in zip(batch, results):
+                window.future.set_result(result)
+
+    def _decode(self, batch):
+        """Run one batch through the model and turn each decode into segments."""
+        import torch
+        import whisper
+        from whisper.audio import SAMPLE_RATE
+        from whisper.tokenizer import get_tokenizer
+
+        model = model_registry.get_model(self.model_name)
+        fp16 = model_registry.is_fp16(model)
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(window.audio), model.dims.n_mels)
+                           for window in batch]).to(model.device)  # decode() casts it to fp16 itself
+        with model_registry.inference_lock(model):  # Warm-up or a direct transcribe may share the model
+            decoded = whisper.decode(model, mel, whisper.DecodingOptions(fp16=fp16))
+
+        results = []
+        fallbacks = 0
+        for window, result in zip(batch, decoded):
+            duration = len(window.audio) / SAMPLE_RATE
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                segments = []
+            elif (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                  or result.avg_logprob < LOGPROB_THRESHOLD):
+                fallbacks += 1
+                fallback = model_registry.transcribe(model, window.audio)
+                segments = offset_segments(fallback["segments"], window.offset)
+            else:
+                tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                          language=result.language, task="transcribe")
+                segments = _segments_from_tokens(result, tokenizer, window.offset, duration)
+            results.append({"segments": segments, "language": result.language})
+
+        with self._stats_lock:
+            self._batches += 1
+            self._windows += len(batch)
+            self._fallbacks += fallbacks
+        return results
+
+
+def _segments_from_tokens(result, tokenizer, offset, duration):
+    """Split a DecodingResult's tokens into Whisper segments at its timestamp tokens."""
+    segments = []
+
+    def add(start, end, tokens):
+        text = tokenizer.decode(tokens)
+        if not text.strip():
+            return
+        segments.append({
+            "id": len(segments),
+            "seek": int(round(offset * 100)),
+            "start": round(offset + start, 3),
+            "end": round(offset + end, 3),
+            "text": text,
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        })
+
+    start, text_tokens = None, []
+    for token in result.tokens:
+        if token >= tokenizer.timestamp_begin:
+            time_seconds = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                add(start, time_seconds, text_tokens)
+                start, text_tokens = None, []
+            else:
+                start = time_seconds
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        add(start or 0.0, duration, text_tokens)
+    return segments
+
+
+def get_scheduler(model_name=model_registry.DEFAULT_MODEL, max_batch_size=MAX_BATCH_SIZE,
+                  max_wait_seconds=MAX_WAIT_SECONDS):
+    """Return the shared BatchScheduler for a model, creating it on first use."""
+    with _lock:
+        scheduler = _schedulers.get(model_name)
+        if scheduler is None:
+            scheduler = BatchScheduler(model_name, max_batch_size, max_wait_seconds)
+            _schedulers[model_name] = scheduler
+        return scheduler
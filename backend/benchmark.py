@@ -0,0 +1,679 @@
+"""
+Benchmark the recording pipelines without an audio device.
+
+Examples:
+    python benchmark.py --synthetic 120
+    python benchmark.py --wav meeting.wav --pipeline handler --speed 4
+    python benchmark.py --synthetic 60 --baseline benchmark_results.json --output new_results.json
+
+A fake PyAudio replaces the real one, so pyaudio, VB-Audio and Windows aren't needed. It
+replays a WAV file, or a deterministic speech-like test signal, at real time (--speed 1) or
+faster, in callback or blocking mode like a real device. It drops frames (and reports an
+input overflow) when the reader falls more than BUFFER_BLOCKS blocks behind.
+
+Each pipeline runs in its own process so peak memory is measured separately:
+    handler    audio_handler.create_pipeline (used by app.py, and by audio.py's record_chunks)
+    streaming  audio3.transcribe_zoom_audio (StreamingTranscriber)
+    analyzer   audio2.ZoomAudioAnalyzer
+
+Results (latency, real-time factor, dropped frames, peak RSS, CPU seconds per thread/stage)
+are written as JSON. With --baseline, metrics that got worse by more than
+REGRESSION_THRESHOLD are flagged.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+PIPELINES = ("handler", "streaming", "analyzer")
+DEFAULT_OUTPUT = "benchmark_results.json"
+SYNTHETIC_SECONDS = 60
+SYNTHETIC_RATE = 16000
+BUFFER_BLOCKS = 8  # Blocks the fake device holds before it starts dropping audio
+SETTLE_SECONDS = 2.0  # Extra time given to streaming pipelines after playback ends
+SAMPLE_SECONDS = 0.5  # How often CPU and queue depths are sampled
+OPEN_TIMEOUT_SECONDS = 60  # How long a pipeline may take to open the fake device
+REGRESSION_THRESHOLD = 0.10  # Relative increase of a lower-is-better metric flagged as a regression
+
+# Metrics compared against a baseline; all of them are better when lower
+COMPARED_METRICS = ("latency_p50_seconds", "latency_p95_seconds", "rtf", "dropped_frames",
+                    "peak_rss_mb", "cpu_seconds")
+
+PA_INT16 = 8
+PA_CONTINUE = 0
+PA_COMPLETE = 1
+PA_INPUT_OVERFLOW = 2
+
+
+def synthetic_speech(seconds=SYNTHETIC_SECONDS, rate=SYNTHETIC_RATE, seed=0):
+    """
+    Deterministic speech-like signal: voiced phrases of syllables separated by pauses.
+
+    It has a pitch, harmonics, syllable-rate loudness changes and pauses, so VAD, chunking
+    and the analyzers behave much as they do on speech. Whisper won't find words in it, so
+    use a real recording (--wav) to measure transcription itself.
+
+    Returns:
+        np.ndarray: int16 samples of shape (frames, 1)
+    """
+    rng = np.random.default_rng(seed)
+    out = np.zeros(int(seconds * rate), dtype=np.float32)
+    t = 0.0
+    while t < seconds:
+        end = min(t + rng.uniform(1.5, 6.0), seconds)
+        n0, n1 = int(t * rate), int(end * rate)
+        times = np.arange(n1 - n0) / rate
+        pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * 0.5 * times))
+        phase = 2 * np.pi * np.cumsum(pitch) / rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 5) * times))
+        out[n0:n1] = 0.2 * voiced * syllables
+        t = end + rng.uniform(0.3, 1.5)
+    out += rng.normal(0, 0.002, len(out)).astype(np.float32)
+    return np.clip(out * 32767, -32768, 32767).astype(np.int16)[:, None]
+
+
+class ReplaySource:
+    def __init__(self, samples, rate):
+        """
+        Audio a fake device plays back.
+
+        Args:
+            samples: int16 samples of shape (frames, channels)
+            rate: Sample rate of the samples
+        """
+        self.samples = samples
+        self.rate = rate
+        self._rendered = {}
+
+    @property
+    def seconds(self):
+        return len(self.samples) / self.rate
+
+    def render(self, rate, channels):
+        """The source converted to what a stream asked for (cached)."""
+        key = (rate, channels)
+        if key not in self._rendered:
+            import audio_utils
+
+            mono = audio_utils.downmix(self.samples.astype(np.float32))
+            mono = audio_utils.resample(mono, self.rate, rate)
+            samples = np.clip(mono, -32768, 32767).astype(np.int16)
+            self._rendered[key] = np.repeat(samples[:, None], channels, axis=1)
+        return self._rendered[key]
+
+
+class FakeStream:
+    def __init__(self, source, speed, rate, channels, frames_per_buffer, stream_callback=None):
+        """
+        Input stream that plays a ReplaySource as if it came from a device.
+
+        In callback mode a thread calls stream_callback every frames_per_buffer frames; in
+        blocking mode read() waits until the requested frames are due. Either way, audio
+        the consumer is too slow to take is dropped once more than BUFFER_BLOCKS blocks are
+        waiting, like a real device buffer overflowing.
+        """
+        self.samples = source.render(rate, channels)
+        self.speed = speed
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+        self.position = 0
+        self.dropped_frames = 0
+        self.overflows = 0
+        self.started_at = None       # time.monotonic() when frame 0 was "played"
+        self.started_at_wall = None  # Same moment in time.time()
+        self.finished = threading.Event()
+        self._active = False
+        self._overflowed = False
+        self._thread = None
+
+    def start_stream(self):
+        if self._active:
+            return
+        self.started_at = time.monotonic()
+        self.started_at_wall = time.time()
+        self._active = True
+        if self.stream_callback is not None:
+            self._thread = threading.Thread(target=self._callback_loop, name="device-callback")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop_stream(self):
+        self._active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+    def is_active(self):
+        return self._active and not self.finished.is_set()
+
+    def get_read_available(self):
+        return max(self._due() - self.position, 0)
+
+    def read(self, num_frames, exception_on_overflow=True):
+        """Return the next num_frames frames as bytes, waiting until they have been played."""
+        if self.started_at is None:
+            self.start_stream()
+        self._wait_until(self.position + num_frames)
+        block = self._next_block(num_frames)
+        if len(block) < num_frames:
+            # Past the end of the source the device keeps delivering silence
+            self.finished.set()
+            block = np.concatenate((block, np.zeros((num_frames - len(block), block.shape[1]), np.int16)))
+        if self._overflowed and exception_on_overflow:
+            self._overflowed = False
+            raise IOError("Input overflowed")
+        self._overflowed = False
+        return block.tobytes()
+
+    def _due(self):
+        """Frames played so far."""
+        return min(int((time.monotonic() - self.started_at) * self.rate * self.speed), len(self.samples))
+
+    def _wait_until(self, frame):
+        delay = self.started_at + frame / (self.rate * self.speed) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _next_block(self, num_frames):
+        backlog = self._due() - self.position
+        limit = BUFFER_BLOCKS * self.frames_per_buffer
+        if backlog > limit:
+            # The device buffer overflowed while nobody was reading
+            lost = backlog - limit
+            self.position += lost
+            self.dropped_frames += lost
+            self.overflows += 1
+            self._overflowed = True
+        block = self.samples[self.position:self.position + num_frames]
+        self.position += len(block)
+        return block
+
+    def _callback_loop(self):
+        while self._active and self.position < len(self.samples):
+            self._wait_until(self.position + self.frames_per_buffer)
+            block = self._next_block(self.frames_per_buffer)
+            status = PA_INPUT_OVERFLOW if self._overflowed else 0
+            self._overflowed = False
+            time_info = {"input_buffer_adc_time": self.position / self.rate, "current_time": time.monotonic()}
+            _, flag = self.stream_callback(block.tobytes(), len(block), time_info, status)
+            if flag == PA_COMPLETE:
+                break
+        self.finished.set()
+
+
+class FakePyAudio:
+    """Stand-in for pyaudio.PyAudio whose only input device replays the benchmark source."""
+
+    source = None
+    speed = 1.0
+    streams = []  # Every stream opened, for reporting
+
+    _device = {"index": 0, "name": "Benchmark replay", "maxInputChannels": 2,
+               "maxOutputChannels": 0, "defaultSampleRate": 44100.0, "hostApi": 0}
+
+    def open(self, format=PA_INT16, channels=1, rate=16000, input=True, input_device_index=None,
+             frames_per_buffer=1024, stream_callback=None, start=True, **kwargs):
+        stream = FakeStream(self.source, self.speed, rate, channels, frames_per_buffer, stream_callback)
+        FakePyAudio.streams.append(stream)
+        if start:
+            stream.start_stream()
+        return stream
+
+    def get_sample_size(self, format):
+        return 2
+
+    def get_device_count(self):
+        return 1
+
+    def get_device_info_by_index(self, index):
+        return dict(self._device)
+
+    def get_host_api_info_by_index(self, index):
+        return {"index": 0, "name": "Benchmark", "deviceCount": 1, "defaultInputDevice": 0}
+
+    def get_device_info_by_host_api_device_index(self, host_api_index, index):
+        return dict(self._device)
+
+    def get_default_input_device_info(self):
+        return dict(self._device)
+
+    def terminate(self):
+        pass
+
+
+def install_fake_pyaudio(source, speed=1.0):
+    """Make `import pyaudio` return the fake. Must run before the pipeline modules are imported."""
+    FakePyAudio.source = source
+    FakePyAudio.speed = speed
+    module = types.ModuleType("pyaudio")
+    module.paInt16 = PA_INT16
+    module.paContinue = PA_CONTINUE
+    module.paComplete = PA_COMPLETE
+    module.paInputOverflow = PA_INPUT_OVERFLOW
+    module.PyAudio = FakePyAudio
+    sys.modules["pyaudio"] = module
+    return module
+
+
+def _stage_name(thread_name):
+    """Group threads into stages: "transcriber-1" -> "transcriber", "Thread-3 (_record_audio)" -> "_record_audio"."""
+    match = re.search(r"\((\w+)\)$", thread_name)
+    if match:
+        return match.group(1)
+    return re.sub(r"([-_]\d+)+$", "", thread_name)
+
+
+def _thread_cpu_seconds():
+    """CPU seconds used so far by each live thread, keyed by native id (empty if unsupported)."""
+    names = {thread.native_id: thread.name for thread in threading.enumerate()}
+    try:
+        import psutil
+
+        return {t.id: (names.get(t.id, "other"), t.user_time + t.system_time)
+                for t in psutil.Process().threads()}
+    except ImportError:
+        pass
+    task_dir = "/proc/self/task"
+    if not os.path.isdir(task_dir):
+        return {}
+    ticks = os.sysconf("SC_CLK_TCK")
+    usage = {}
+    for tid in os.listdir(task_dir):
+        try:
+            with open(os.path.join(task_dir, tid, "stat")) as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # The thread exited meanwhile
+        usage[int(tid)] = (names.get(int(tid), "other"), (int(fields[11]) + int(fields[12])) / ticks)
+    return usage
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+class ResourceSampler:
+    def __init__(self, probes=None):
+        """
+        Sample per-thread CPU and the given queue-depth probes in the background.
+
+        Args:
+            probes: Dict of name -> function returning a number; the maximum of each is reported
+        """
+        self.probes = probes or {}
+        self.maxima = {name: 0 for name in self.probes}
+        self._threads = {}  # native id -> (name, last CPU seconds seen)
+        self._baseline = {}  # native id -> CPU seconds used before the sampler started
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="benchmark-sampler")
+        self._thread.daemon = True
+
+    def __enter__(self):
+        self._cpu_start = os.times()
+        self._baseline = {tid: seconds for tid, (_, seconds) in _thread_cpu_seconds().items()}
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self._sample()
+
+    def _sample(self):
+        self._threads.update(_thread_cpu_seconds())
+        for name, probe in self.probes.items():
+            try:
+                self.maxima[name] = max(self.maxima[name], probe())
+            except Exception:
+                pass
+
+    def report(self):
+        end = os.times()
+        stages = {}
+        for tid, (name, seconds) in self._threads.items():
+            stage = _stage_name(name)
+            stages[stage] = round(stages.get(stage, 0.0) + seconds - self._baseline.get(tid, 0.0), 3)
+        report = {
+            "cpu_seconds": round((end.user - self._cpu_start.user) + (end.system - self._cpu_start.system), 3),
+            "cpu_seconds_by_stage": dict(sorted(stages.items(), key=lambda item: -item[1])),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        report.update({f"max_{name}": value for name, value in self.maxima.items()})
+        return report
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+def _latency_stats(latencies):
+    return {
+        "latency_p50_seconds": _percentile(latencies, 50),
+        "latency_p95_seconds": _percentile(latencies, 95),
+        "latency_max_seconds": round(max(latencies), 3) if latencies else None,
+    }
+
+
+def _wait_for_playback():
+    """Block until the pipeline has opened the fake device and the whole source has played."""
+    deadline = time.monotonic() + OPEN_TIMEOUT_SECONDS
+    while not FakePyAudio.streams:
+        if time.monotonic() > deadline:
+            raise RuntimeError("The pipeline never opened the audio device")
+        time.sleep(0.01)
+    FakePyAudio.streams[0].finished.wait()
+
+
+def _device_stats(source):
+    streams = FakePyAudio.streams
+    return {
+        "audio_seconds": round(source.seconds, 3),
+        "dropped_frames": sum(stream.dropped_frames for stream in streams),
+        "device_overflows": sum(stream.overflows for stream in streams),
+    }
+
+
+def run_handler(source, args):
+    """audio_handler's chunked pipeline; latency is measured per segment reaching the transcript."""
+    import audio_handler
+    import model_registry
+    from segment_log import SegmentLog
+
+    audio_handler.MODEL_NAME = args.model
+    audio_handler.ADAPTIVE_MODEL = args.adaptive
+    audio_handler.CACHE_TRANSCRIPTIONS = args.cache
+
+    load_started = time.perf_counter()
+    model_registry.warm_up(args.model)
+    load_seconds = time.perf_counter() - load_started
+
+    inference = []  # (audio seconds, elapsed seconds) per model call
+    run_model = audio_handler._run_model
+
+    def timed_run_model(audio, model_name):
+        started = time.perf_counter()
+        result = run_model(audio, model_name)
+        inference.append((len(audio) / audio_handler.TARGET_RATE, time.perf_counter() - started))
+        return result
+
+    audio_handler._run_model = timed_run_model
+
+    latencies = []
+    models = {}  # model name -> segments it produced
+
+    class TimedSegmentLog(SegmentLog):
+        def extend(self, segments, session=None):
+            now = time.monotonic()
+            stream = FakePyAudio.streams[0]
+            for segment in segments:
+                latencies.append(now - (stream.started_at + segment["end"] / stream.speed))
+                models[segment.get("model")] = models.get(segment.get("model"), 0) + 1
+            super().extend(segments, session)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        pipeline = audio_handler.create_pipeline(device_index=0, segment_log=TimedSegmentLog(),
+                                                 output_dir=output_dir)
+        probes = {"queue_depth": pipeline.chunk_queue.qsize,
+                  "backlog_seconds": lambda: pipeline.stats()["backlog_seconds"]}
+        with ResourceSampler(probes) as sampler:
+            started = time.perf_counter()
+            pipeline.start()
+            _wait_for_playback()
+            pipeline.stop(wait=True)
+            wall = time.perf_counter() - started
+        stats = pipeline.stats()
+
+    inferred_audio = sum(seconds for seconds, _ in inference)
+    result = {
+        "model": args.model,
+        "model_load_seconds": round(load_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "segments": len(latencies),
+        "segments_by_model": models,
+        "chunks_transcribed": stats["transcribed"],
+        "chunks_dropped": stats["dropped"],
+        "rtf": round(sum(elapsed for _, elapsed in inference) / inferred_audio, 3) if inferred_audio else None,
+        "input_overflows": stats.get("input_overflows"),
+        "ring_overruns": stats.get("ring_overruns"),
+    }
+    result.update(_latency_stats(latencies))
+    result.update(_device_stats(source))
+    result.update(sampler.report())
+    return result
+
+
+def run_streaming(source, args):
+    """audio3's streaming transcriber; latency is measured for every partial and final segment."""
+    import _thread
+    import audio3
+    import model_registry
+    import streaming
+
+    audio3.MODEL_NAME = args.model
+    audio3.ADAPTIVE_MODEL = args.adaptive
+    load_started = time.perf_counter()
+    model_registry.warm_up(args.model)
+    load_seconds = time.perf_counter() - load_started
+
+    decode_seconds = [0.0]
+    decode = streaming.StreamingTranscriber._decode
+
+    def timed_decode(self, *a, **kw):
+        started = time.perf_counter()
+        try:
+            return decode(self, *a, **kw)
+        finally:
+            decode_seconds[0] += time.perf_counter() - started
+
+    streaming.StreamingTranscriber._decode = timed_decode
+
+    latencies, final_latencies = [], []
+
+    def on_segment(segment):
+        stream = FakePyAudio.streams[0]
+        latency = segment["emitted_at"] - (stream.started_at_wall + segment["end"] / stream.speed)
+        (final_latencies if segment["final"] else latencies).append(latency)
+
+    def stop_after_playback():
+        _wait_for_playback()
+        time.sleep(SETTLE_SECONDS + audio3.STEP_SECONDS)
+        _thread.interrupt_main()  # transcribe_zoom_audio stops on Ctrl+C
+
+    threading.Thread(target=stop_after_playback, name="benchmark-stopper", daemon=True).start()
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        audio3.transcribe_zoom_audio(device_index=0, on_segment=on_segment)
+        wall = time.perf_counter() - started
+
+    result = {
+        "model": args.model,
+        "model_load_seconds": round(load_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "segments": len(final_latencies),
+        "partial_segments": len(latencies),
+        # Windows are re-decoded every step, so this is compute per second of audio, not per decode
+        "rtf": round(decode_seconds[0] / source.seconds, 3) if source.seconds else None,
+        "final_latency_p50_seconds": _percentile(final_latencies, 50),
+        "final_latency_p95_seconds": _percentile(final_latencies, 95),
+    }
+    result.update(_latency_stats(latencies + final_latencies))
+    result.update(_device_stats(source))
+    result.update(sampler.report())
+    return result
+
+
+def run_analyzer(source, args):
+    """audio2's ZoomAudioAnalyzer; reports how far analysis falls behind and stop/post-processing time."""
+    from audio2 import ZoomAudioAnalyzer
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        analyzer = ZoomAudioAnalyzer(output_dir=output_dir, record_seconds=source.seconds + 60)
+        probes = {"analysis_queue_blocks": analyzer.audio_data_queue.qsize}
+        with ResourceSampler(probes) as sampler:
+            started = time.perf_counter()
+            analyzer.start_recording()
+            _wait_for_playback()
+            stop_started = time.perf_counter()
+            analyzer.stop_recording()
+            stop_seconds = time.perf_counter() - stop_started
+            wall = time.perf_counter() - started
+        analyzer.cleanup()
+
+    result = {
+        "wall_seconds": round(wall, 3),
+        "stop_seconds": round(stop_seconds, 3),
+        "frames_written": analyzer.frames_written,
+        "skipped_recognitions": analyzer.skipped_recognitions,
+    }
+    result.update(_device_stats(source))
+    result.update(sampler.report())
+    return result
+
+
+RUNNERS = {"handler": run_handler, "streaming": run_streaming, "analyzer": run_analyzer}
+
+
+def load_source(args):
+    if args.wav:
+        from archiver import read_wav
+
+        samples, rate = read_wav(args.wav)
+        return ReplaySource(samples, rate)
+    return ReplaySource(synthetic_speech(args.synthetic, SYNTHETIC_RATE, args.seed), SYNTHETIC_RATE)
+
+
+def run_child(args):
+    """Run one pipeline in this process and write its metrics to args.result_file."""
+    source = load_source(args)
+    install_fake_pyaudio(source, args.speed)
+    try:
+        result = RUNNERS[args.pipeline](source, args)
+    except ImportError as e:
+        result = {"skipped": f"missing dependency: {e}"}
+    with open(args.result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+def compare(results, baseline):
+    """
+    Returns:
+        list: (pipeline, metric, old, new, relative_change) for metrics worse by more than
+            REGRESSION_THRESHOLD
+    """
+    regressions = []
+    for pipeline, metrics in results.items():
+        old_metrics = baseline.get("results", {}).get(pipeline, {})
+        for metric in COMPARED_METRICS:
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old if old else (1.0 if new > 0 else 0.0)
+            if change > REGRESSION_THRESHOLD:
+                regressions.append((pipeline, metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recording pipelines with a fake audio device.")
+    parser.add_argument("--pipeline", choices=PIPELINES + ("all",), default="all")
+    parser.add_argument("--wav", help="16-bit WAV file to replay (default: synthetic speech)")
+    parser.add_argument("--synthetic", type=float, default=SYNTHETIC_SECONDS,
+                        help=f"Seconds of synthetic speech to generate (default: {SYNTHETIC_SECONDS})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic signal (default: 0)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed; 1 is real time, 4 replays four times faster (default: 1)")
+    parser.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    parser.add_argument("--cache", action="store_true", help="Allow transcription cache hits (off by default)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Let the model governor switch models (off by default, --model is used throughout)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)  # Set when running as a child process
+    args = parser.parse_args()
+
+    if args.result_file:
+        run_child(args)
+        return
+
+    pipelines = PIPELINES if args.pipeline == "all" else (args.pipeline,)
+    results = {}
+    for pipeline in pipelines:
+        print(f"Benchmarking {pipeline}...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_file = f.name
+        child_args = ["--pipeline", pipeline, "--result-file", result_file, "--synthetic", str(args.synthetic),
+                      "--seed", str(args.seed), "--speed", str(args.speed), "--model", args.model]
+        if args.wav:
+            child_args += ["--wav", args.wav]
+        if args.cache:
+            child_args.append("--cache")
+        if args.adaptive:
+            child_args.append("--adaptive")
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__)] + child_args)
+        try:
+            with open(result_file, 'r', encoding='utf-8') as f:
+                results[pipeline] = json.load(f)
+        except (OSError, ValueError):
+            results[pipeline] = {"failed": f"exit code {completed.returncode}"}
+        finally:
+            if os.path.exists(result_file):
+                os.remove(result_file)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"source": args.wav or f"synthetic:{args.synthetic}s:seed{args.seed}",
+                   "speed": args.speed, "model": args.model, "cache": args.cache, "adaptive": args.adaptive},
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for pipeline, metrics in results.items():
+        print(f"\n{pipeline}:")
+        for name, value in metrics.items():
+            print(f"  {name}: {value}")
+    print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+        for pipeline, metric, old, new, change in regressions:
+            print(f"REGRESSION {pipeline}.{metric}: {old} -> {new} (+{change:.0%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
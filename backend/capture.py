@@ -0,0 +1,161 @@
+import threading
+
+import numpy as np
+
+import audio_utils
+import metrics
+
+BUFFER_SECONDS = 120  # Audio kept in the ring buffer; readers must stay within this of live
+
+
+class AudioCapture:
+    def __init__(self, device_index=None, rate=44100, channels=2, frames_per_buffer=1024,
+                 target_rate=audio_utils.WHISPER_RATE, target_channels=1,
+                 buffer_seconds=BUFFER_SECONDS):
+        """
+        Long-lived capture stream writing into a preallocated ring buffer.
+
+        PyAudio runs in callback mode, so the device is read on PortAudio's thread and there
+        is no gap between chunks. Each block is converted to target_rate/target_channels
+        and copied into a NumPy ring that is allocated once. The ring is stored twice back
+        to back, so any range up to buffer_seconds long can be returned as a contiguous view
+        without copying.
+
+        Args:
+            device_index: Input device to open (default: system default)
+            rate: Device sample rate (default: 44100)
+            channels: Device channel count (default: 2)
+            frames_per_buffer: Frames per PortAudio callback (default: 1024)
+            target_rate: Sample rate stored in the ring (default: 16000)
+            target_channels: Channels stored in the ring (default: 1)
+            buffer_seconds: Ring capacity in seconds (default: BUFFER_SECONDS)
+        """
+        self.device_index = device_index
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.target_rate = target_rate
+        self.target_channels = target_channels
+        self.converter = audio_utils.CaptureConverter(rate, channels, target_rate, target_channels)
+
+        self.capacity = int(buffer_seconds * target_rate)
+        self._ring = np.zeros((2 * self.capacity, target_channels), dtype=np.int16)
+        self._written = 0  # Total samples ever written; the ring holds the last `capacity`
+        self._cond = threading.Condition()
+
+        self.input_overflows = 0  # Blocks PortAudio reported as overflowed (audio lost at the device)
+        self.ring_overruns = 0    # Reads that asked for audio already overwritten in the ring
+        self.callbacks = 0
+
+        self._pa = None
+        self._stream = None
+        self._overflow_flag = 0
+        self._continue = 0
+
+    @property
+    def frames_written(self):
+        """Stream index one past the newest stored sample."""
+        return self._written
+
+    def start(self):
+        """Open the device and start filling the ring buffer."""
+        if self._stream is not None:
+            return
+        import pyaudio  # Imported here so that importing this module doesn't load PortAudio
+        self._overflow_flag = pyaudio.paInputOverflow
+        self._continue = pyaudio.paContinue
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(format=pyaudio.paInt16,
+                                     channels=self.channels,
+                                     rate=self.rate,
+                                     input=True,
+                                     input_device_index=self.device_index,
+                                     frames_per_buffer=self.frames_per_buffer,
+                                     stream_callback=self._on_audio)
+        self._stream.start_stream()
+
+    def close(self):
+        """Stop the device and flush the resampler tail into the ring."""
+        if self._stream is None:
+            return
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
+        self._stream = None
+        self._pa = None
+        self.write(self.converter.flush())
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """PortAudio callback: convert the block and store it."""
+        self.callbacks += 1
+        if status & self._overflow_flag:
+            self.input_overflows += 1
+        with metrics.STAGE_SECONDS.time(stage="capture_convert"):
+            self.write(self.converter.process(in_data))
+        return (None, self._continue)
+
+    def write(self, samples):
+        """Append int16 samples of shape (frames, target_channels) to the ring."""
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self._written += n - self.capacity
+            n = self.capacity
+
+        start = self._written % self.capacity
+        first = min(n, self.capacity - start)
+        # Write each sample to both halves so every window of `capacity` is contiguous
+        for base in (0, self.capacity):
+            self._ring[base + start:base + start + first] = samples[:first]
+        if first < n:
+            rest = n - first
+            self._ring[:rest] = samples[first:]
+            self._ring[self.capacity:self.capacity + rest] = samples[first:]
+
+        with self._cond:
+            self._written += n
+            self._cond.notify_all()
+
+    def wait_for(self, index, timeout=None):
+        """
+        Block until the stream reaches sample `index` (or timeout).
+
+        Returns:
+            int: frames_written when the wait ended
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._written >= index, timeout)
+            return self._written
+
+    def read(self, start, end):
+        """
+        Return samples [start, end) of the stream as a view into the ring.
+
+        The view is only valid until the ring wraps past it; copy it (np.array) to keep it.
+        If part of the range was already overwritten, the oldest available part is returned
+        from `start` onward and ring_overruns is incremented.
+        """
+        end = min(end, self._written)
+        oldest = max(self._written - self.capacity, 0)
+        if start < oldest:
+            self.ring_overruns += 1
+            start = oldest
+        if end <= start:
+            return self._ring[:0]
+        offset = start % self.capacity
+        return self._ring[offset:offset + (end - start)]
+
+    def read_seconds(self, start_seconds, end_seconds):
+        """Like read() but with stream times in seconds."""
+        return self.read(int(start_seconds * self.target_rate), int(end_seconds * self.target_rate))
+
+    def stats(self):
+        """Counters describing capture health."""
+        return {
+            "captured_seconds": round(self._written / self.target_rate, 3),
+            "callbacks": self.callbacks,
+            "input_overflows": self.input_overflows,
+            "ring_overruns": self.ring_overruns,
+        }
@@ -0,0 +1,133 @@
+import numpy as np
+
+from vad import VoiceActivityDetector
+
+MIN_CHUNK_SECONDS = 10.0  # Never cut a chunk shorter than this
+MAX_CHUNK_SECONDS = 30.0  # Always cut by this length (matches Whisper's 30 s window)
+MIN_PAUSE_SECONDS = 0.5  # Silence needed to count as a pause worth cutting at
+
+
+class AdaptiveChunker:
+    def __init__(self, rate=16000, min_seconds=MIN_CHUNK_SECONDS, max_seconds=MAX_CHUNK_SECONDS,
+                 min_pause_seconds=MIN_PAUSE_SECONDS, **vad_options):
+        """
+        Split a continuous stream into chunks at pauses instead of at fixed lengths.
+
+        Once a chunk is at least min_seconds long it is cut in the middle of the first pause
+        of min_pause_seconds. If it reaches max_seconds without such a pause, it is cut at the
+        longest silence available, or at the quietest frame if there is no silence at all,
+        so words are not split in half.
+
+        Args:
+            rate: Sample rate of the incoming audio (default: 16000)
+            min_seconds: Shortest chunk produced (except for the final flush)
+            max_seconds: Longest chunk produced
+            min_pause_seconds: Silence length that ends a chunk once min_seconds is reached
+            vad_options: Extra keyword arguments for VoiceActivityDetector
+        """
+        self.rate = rate
+        self.detector = VoiceActivityDetector(rate, **vad_options)
+        frame = self.detector.frame_length
+        self.min_frames = int(min_seconds * rate) // frame
+        self.max_frames = int(max_seconds * rate) // frame
+        self.pause_frames = max(int(min_pause_seconds * rate) // frame, 1)
+
+        self._blocks = []                                # Samples not yet emitted by process()
+        self._activity = np.zeros(0, dtype=bool)         # One entry per complete frame since offset
+        self._energy = np.zeros(0, dtype=np.float32)
+        self.offset = 0                                  # Stream sample index where the open chunk starts
+        self.samples_seen = 0                            # Stream samples fed so far
+        self.boundaries = []                             # (start_seconds, end_seconds) of each chunk
+
+    def feed(self, samples):
+        """
+        Analyze captured samples without keeping them and return the chunks they complete.
+
+        Use this when the audio already lives in a buffer (e.g. a capture ring buffer).
+
+        Returns:
+            list: (start_sample, end_sample) stream ranges, one per chunk that could be cut
+        """
+        self.samples_seen += len(samples)
+        active = self.detector.process(samples)
+        self._activity = np.concatenate((self._activity, active))
+        self._energy = np.concatenate((self._energy, self.detector.last_energy))
+
+        ranges = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            ranges.append(self._cut(self.offset + cut * self.detector.frame_length))
+        return ranges
+
+    def flush_range(self):
+        """Close the open chunk at the end of the stream; returns its range or None if empty."""
+        if self.samples_seen == self.offset:
+            return None
+        return self._cut(self.samples_seen)
+
+    def process(self, samples):
+        """
+        Add captured samples and return the chunks they complete.
+
+        Returns:
+            list: (samples, start_seconds) for every chunk that could be cut
+        """
+        self._blocks.append(samples)
+        return [self._take(chunk_range) for chunk_range in self.feed(samples)]
+
+    def flush(self):
+        """Return whatever is buffered as a final (possibly short) chunk, or None."""
+        chunk_range = self.flush_range()
+        return None if chunk_range is None else self._take(chunk_range)
+
+    def _find_cut(self):
+        """Return the frame to cut at, or None if the buffer should keep growing."""
+        n_frames = len(self._activity)
+        if n_frames < self.min_frames:
+            return None
+
+        # Runs of silence: start/end frame of every False stretch
+        silent = ~self._activity[:self.max_frames]
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+        starts, ends = edges[::2], edges[1::2]
+
+        # First pause that ends after min_frames (a pause still running at the buffer end
+        # may get longer, but it's long enough to cut in already)
+        long_enough = (ends - starts >= self.pause_frames) & (ends > self.min_frames)
+        if long_enough.any():
+            i = np.flatnonzero(long_enough)[0]
+            return max((starts[i] + ends[i]) // 2, self.min_frames)
+
+        if n_frames < self.max_frames:
+            return None
+
+        # Forced cut: longest silence past min_frames, else the quietest frame
+        usable = ends > self.min_frames
+        if usable.any():
+            lengths = np.where(usable, ends - np.maximum(starts, self.min_frames), 0)
+            i = int(np.argmax(lengths))
+            return (max(starts[i], self.min_frames) + ends[i]) // 2
+        window = self._energy[self.min_frames:self.max_frames]
+        return self.min_frames + int(np.argmin(window))
+
+    def _cut(self, cut_sample):
+        """Close the open chunk at stream sample cut_sample and return its range."""
+        cut_sample = int(cut_sample)
+        cut_frame = (cut_sample - self.offset) // self.detector.frame_length
+        self._activity = self._activity[cut_frame:]
+        self._energy = self._energy[cut_frame:]
+
+        chunk_range = (self.offset, cut_sample)
+        self.boundaries.append((self.offset / self.rate, cut_sample / self.rate))
+        self.offset = cut_sample
+        return chunk_range
+
+    def _take(self, chunk_range):
+        """Remove a closed chunk from the process() buffer and return (samples, start_seconds)."""
+        start, end = chunk_range
+        buffered = np.concatenate(self._blocks) if len(self._blocks) > 1 else self._blocks[0]
+        chunk, rest = buffered[:end - start], buffered[end - start:]
+        self._blocks = [rest] if len(rest) else []
+        return chunk, start / self.rate
@@ -0,0 +1,183 @@
+"""
+Compare CPU inference profiles for speed and accuracy on a recording.
+
+Examples:
+    python cpu_profile_report.py zoom_call.wav
+    python cpu_profile_report.py zoom_call.wav --model small --workers 4 --output cpu_report.json
+
+The recording is transcribed once per profile, by --workers concurrent transcriptions,
+each on its own copy of the model like batch_transcribe's workers:
+    default  fp32, torch's default threads (every worker may use every core)
+    pinned   fp32, torch threads split between the workers
+    int8     Linear layers quantized to int8, threads split between the workers
+
+Each profile runs in its own process, because torch's thread settings are per process.
+Accuracy is the word error rate (WER) against the reference transcript, zoom_call.json by
+default, and against the default profile's own output. The second number isolates what
+quantization changes from what the model gets wrong either way.
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = {
+    "default": {"precision": "fp32", "pin_threads": False},
+    "pinned": {"precision": "fp32", "pin_threads": True},
+    "int8": {"precision": "int8", "pin_threads": True},
+}
+DEFAULT_REFERENCE = "zoom_call.json"
+DEFAULT_OUTPUT = "cpu_profile_report.json"
+
+
+def _normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance between two texts divided by the reference length."""
+    ref, hyp = _normalize_words(reference), _normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_profile(audio_path, model_name, profile, workers):
+    """Transcribe the recording with one profile in this process and return its measurements."""
+    import whisper
+    import model_registry
+
+    settings = PROFILES[profile]
+    threads = None
+    if settings["pin_threads"]:
+        threads = model_registry.configure_cpu_threads(workers)
+
+    started = time.perf_counter()
+    model = model_registry.get_model(model_name, "cpu", settings["precision"])
+    load_seconds = time.perf_counter() - started
+    model_registry.warm_up(model_name, "cpu", settings["precision"])
+    # Whisper can't run two decodes at once on one instance, so every worker gets its own copy
+    models = [model] + [copy.deepcopy(model) for _ in range(workers - 1)]
+
+    audio = whisper.load_audio(audio_path)
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+    results = [None] * workers
+    elapsed = [0.0] * workers
+
+    def transcribe(i):
+        call_started = time.perf_counter()
+        results[i] = models[i].transcribe(audio, fp16=False)
+        elapsed[i] = time.perf_counter() - call_started
+
+    started = time.perf_counter()
+    worker_threads = [threading.Thread(target=transcribe, args=(i,), name=f"worker-{i}") for i in range(workers)]
+    for thread in worker_threads:
+        thread.start()
+    for thread in worker_threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return {
+        "precision": settings["precision"],
+        "threads_per_worker": threads,
+        "model_load_seconds": round(load_seconds, 3),
+        "audio_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 3),
+        # Overall throughput: wall time per second of audio over all workers
+        "rtf": round(wall / (duration * workers), 3),
+        "rtf_per_call": round(sum(elapsed) / (duration * workers), 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "text": results[0]["text"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU inference profiles for speed and accuracy.")
+    parser.add_argument("audio", help="Recording to transcribe (e.g. the zoom_call recording)")
+    parser.add_argument("--reference", default=DEFAULT_REFERENCE,
+                        help=f"Reference transcript, .json (Whisper result) or .txt (default: {DEFAULT_REFERENCE})")
+    parser.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent transcriptions (default: 2)")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES),
+                        help="Profiles to compare (default: all)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Report file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--profile", choices=list(PROFILES), help=argparse.SUPPRESS)  # Set in child processes
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(run_profile(args.audio, args.model, args.profile, args.workers), f)
+        return
+
+    with open(args.reference, 'r', encoding='utf-8') as f:
+        reference = json.load(f)["text"] if args.reference.endswith(".json") else f.read()
+
+    results = {}
+    for profile in args.profiles:
+        print(f"Running profile '{profile}'...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_file = f.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), args.audio, "--model", args.model,
+                            "--workers", str(args.workers), "--profile", profile, "--result-file", result_file],
+                           check=True)
+            with open(result_file, 'r', encoding='utf-8') as f:
+                results[profile] = json.load(f)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            print(f"Profile '{profile}' failed: {e}")
+        finally:
+            if os.path.exists(result_file):
+                os.remove(result_file)
+
+    baseline = results.get("default")
+    for result in results.values():
+        result["wer_vs_reference"] = round(word_error_rate(reference, result["text"]), 4)
+        if baseline is not None:
+            result["wer_vs_default"] = round(word_error_rate(baseline["text"], result["text"]), 4)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "audio": args.audio,
+        "reference": args.reference,
+        "model": args.model,
+        "workers": args.workers,
+        "cpus": os.cpu_count(),
+        "profiles": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n| profile | precision | threads/worker | load s | RTF | RTF per call | speedup | WER vs reference | WER vs default | peak RSS MB |")
+    print("|---|---|---|---|---|---|---|---|---|---|")
+    for profile, result in results.items():
+        speedup = f"{baseline['rtf'] / result['rtf']:.2f}x" if baseline and result["rtf"] else "-"
+        print(f"| {profile} | {result['precision']} | {result['threads_per_worker'] or 'default'} | "
+              f"{result['model_load_seconds']} | {result['rtf']} | {result['rtf_per_call']} | {speedup} | "
+              f"{result['wer_vs_reference']:.2%} | {result.get('wer_vs_default', 0):.2%} | {result['peak_rss_mb']} |")
+    print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import wave
+
+import librosa
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import get_window
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+BLOCK_SECONDS = 30  # Audio read from disk per block when analyzing a saved file
+PLOT_COLUMNS = 2048  # Spectrogram/waveform columns kept for plotting, however long the session
+
+
+class _PooledColumns:
+    def __init__(self, max_columns):
+        """
+        Column store for plotting that never holds more than 2 * max_columns columns.
+
+        Incoming columns are averaged in groups of `pool`; whenever the store fills up,
+        neighbouring columns are merged and `pool` doubles.
+        """
+        self.max_columns = max_columns
+        self.pool = 1
+        self._columns = []
+        self._pending = None
+
+    def extend(self, values, reduce=np.mean):
+        """Add frames given as an array of shape (rows, frames)."""
+        if self._pending is not None:
+            values = np.concatenate((self._pending, values), axis=1)
+        groups = values.shape[1] // self.pool
+        if groups:
+            pooled = values[:, :groups * self.pool].reshape(values.shape[0], groups, self.pool)
+            self._columns.append(reduce(pooled, axis=2).astype(np.float32))
+        self._pending = values[:, groups * self.pool:]
+
+        if sum(block.shape[1] for block in self._columns) > 2 * self.max_columns:
+            stacked = np.concatenate(self._columns, axis=1)
+            even = stacked.shape[1] // 2 * 2
+            self._columns = [reduce(stacked[:, :even].reshape(stacked.shape[0], even // 2, 2), axis=2)]
+            if even < stacked.shape[1]:
+                # An odd column out goes back to pending, scaled to the old pool size
+                self._pending = np.concatenate(
+                    (np.repeat(stacked[:, even:], self.pool, axis=1), self._pending), axis=1)
+            self.pool *= 2
+
+    def array(self):
+        if not self._columns:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(self._columns, axis=1)
+
+
+class FeatureExtractor:
+    def __init__(self, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, n_mfcc=N_MFCC,
+                 plot_columns=PLOT_COLUMNS):
+        """
+        Streaming audio feature extractor built on a single STFT.
+
+        Each block of audio is framed once and transformed once; spectral centroid,
+        zero-crossing rate, mel spectrogram, MFCCs and spectral contrast are all derived
+        from those frames. Audio can be fed live while recording or streamed from disk, and
+        memory grows only with the small per-frame feature vectors, not with the audio.
+
+        Args:
+            sr: Sample rate of the audio
+            n_fft: FFT size / frame length (default: 2048)
+            hop_length: Samples between frames (default: 512)
+            n_mels: Mel bands (default: 128)
+            n_mfcc: MFCC coefficients kept (default: 13)
+            plot_columns: Resolution kept for the spectrogram and waveform plots
+        """
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+        self.window = get_window('hann', n_fft, fftbins=True).astype(np.float32)
+        self.freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+
+        self._carry = np.zeros(0, dtype=np.float32)  # Samples not yet covered by a full frame
+        self.samples_seen = 0
+        self.frames_seen = 0
+
+        self._centroid = []
+        self._zcr = []
+        self._mfcc = []
+        self._contrast = []
+        self._spectrogram = _PooledColumns(plot_columns)  # |STFT| pooled for plotting
+        self._waveform_min = _PooledColumns(plot_columns)
+        self._waveform_max = _PooledColumns(plot_columns)
+        self._peak_magnitude = 0.0
+
+    def update(self, samples):
+        """Add float32 mono samples (any length) and compute features for the completed frames."""
+        samples = np.concatenate((self._carry, np.asarray(samples, dtype=np.float32)))
+        self.samples_seen += len(samples) - len(self._carry)
+        if len(samples) < self.n_fft:
+            self._carry = samples
+            return
+
+        frames = sliding_window_view(samples, self.n_fft)[::self.hop_length]
+        n_frames = len(frames)
+        self._carry = samples[n_frames * self.hop_length:]
+        self.frames_seen += n_frames
+
+        # The one STFT everything else is derived from
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1)).T.astype(np.float32)
+        power = magnitude ** 2
+
+        total = magnitude.sum(axis=0)
+        self._centroid.append(np.divide((self.freqs[:, None] * magnitude).sum(axis=0), total,
+                                        out=np.zeros_like(total), where=total > 0))
+
+        signs = np.signbit(frames)
+        self._zcr.append(np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.n_fft)
+
+        log_mel = librosa.power_to_db(self.mel_basis @ power, top_db=None)
+        self._mfcc.append(librosa.feature.mfcc(S=log_mel, n_mfcc=self.n_mfcc))
+        self._contrast.append(librosa.feature.spectral_contrast(S=magnitude, sr=self.sr, n_fft=self.n_fft))
+
+        self._peak_magnitude = max(self._peak_magnitude, float(magnitude.max()))
+        self._spectrogram.extend(magnitude)
+        hop_frames = frames[:, :self.hop_length]
+        self._waveform_min.extend(hop_frames.min(axis=1)[None, :], reduce=np.min)
+        self._waveform_max.extend(hop_frames.max(axis=1)[None, :], reduce=np.max)
+
+    def features(self):
+        """
+        Returns:
+            dict: Per-frame arrays (spectral_centroid, zero_crossing_rate, mfcc, spectral_contrast)
+        """
+        def joined(blocks, rows):
+            return np.concatenate(blocks, axis=-1) if blocks else np.zeros((rows, 0))
+
+        return {
+            "spectral_centroid": joined(self._centroid, 0).reshape(-1),
+            "zero_crossing_rate": joined(self._zcr, 0).reshape(-1),
+            "mfcc": joined(self._mfcc, self.n_mfcc),
+            "spectral_contrast": joined(self._contrast, 7),
+        }
+
+    def save(self, filename):
+        """Write the per-frame features to an .npz file."""
+        np.savez_compressed(filename, sr=self.sr, hop_length=self.hop_length, **self.features())
+
+    def plot(self, filename):
+        """Save waveform, spectrogram and MFCC plots like the original full-file analysis."""
+        import matplotlib.pyplot as plt
+        import librosa.display
+
+        duration = self.samples_seen / self.sr
+        plt.figure(figsize=(15, 10))
+
+        # Plot waveform (min/max envelope)
+        plt.subplot(3, 1, 1)
+        low, high = self._waveform_min.array(), self._waveform_max.array()
+        if low.size:
+            times = np.linspace(0, duration, low.shape[1])
+            plt.fill_between(times, low[0], high[0], linewidth=0)
+            plt.xlim(0, duration)
+        plt.title('Waveform')
+
+        # Plot spectrogram
+        plt.subplot(3, 1, 2)
+        spectrogram = self._spectrogram.array()
+        if spectrogram.size:
+            D = librosa.amplitude_to_db(spectrogram, ref=self._peak_magnitude or 1.0)
+            librosa.display.specshow(D, sr=self.sr, hop_length=self.hop_length * self._spectrogram.pool,
+                                     x_axis='time', y_axis='log')
+            plt.colorbar(format='%+2.0f dB')
+        plt.title('Spectrogram')
+
+        # Plot MFCCs
+        plt.subplot(3, 1, 3)
+        mfcc = self.features()["mfcc"]
+        if mfcc.size:
+            librosa.display.specshow(mfcc, sr=self.sr, hop_length=self.hop_length, x_axis='time')
+            plt.colorbar()
+        plt.title('MFCCs')
+
+        plt.tight_layout()
+        plt.savefig(filename)
+        plt.close()
+
+
+def read_wav_blocks(filename, block_seconds=BLOCK_SECONDS):
+    """
+    Yield (sample_rate, float32 mono samples) blocks from a 16-bit WAV file.
+
+    Only one block is in memory at a time.
+    """
+    with wave.open(filename, 'rb') as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{filename}: only 16-bit WAV files are supported")
+        block_frames = int(block_seconds * rate)
+        while True:
+            data = wf.readframes(block_frames)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+            yield rate, samples.mean(axis=1, dtype=np.float32) * (1.0 / 32768.0)
+
+
+def extract_file(filename, block_seconds=BLOCK_SECONDS):
+    """Compute features for a saved WAV file by streaming it through a FeatureExtractor."""
+    extractor = None
+    for rate, samples in read_wav_blocks(filename, block_seconds):
+        if extractor is None:
+            extractor = FeatureExtractor(rate)
+        extractor.update(samples)
+    return extractor
@@ -0,0 +1,166 @@
+import collections
+import threading
+import time
+
+import model_registry
+
+MODELS = ("tiny", "base", "small")  # Models switched between, fastest first
+RELATIVE_COST = {"tiny": 1.0, "base": 2.0, "small": 6.0, "medium": 15.0, "large": 30.0}  # Rough compute per audio second
+DOWNGRADE_RTF = 0.9  # Switch to a faster model when the current one needs this much of real time...
+MAX_BACKLOG_SECONDS = 30  # ...or when this much audio is waiting to be transcribed
+UPGRADE_RTF = 0.5  # Switch to a slower model only if it is expected to stay under this RTF...
+UPGRADE_BACKLOG_SECONDS = 5  # ...and at most this much audio is waiting
+MIN_DWELL_SECONDS = 60  # Time on a model before switching to a slower one
+MIN_SAMPLES = 3  # Model calls measured on a model before any switch away from it
+RTF_WINDOW = 8  # Recent model calls the RTF of each model is computed over
+RTF_MEMORY_SECONDS = 600  # How long a measured RTF is trusted over the RELATIVE_COST estimate
+
+
+class ModelGovernor:
+    def __init__(self, models=MODELS, initial=None, backlog=None, downgrade_rtf=DOWNGRADE_RTF,
+                 max_backlog_seconds=MAX_BACKLOG_SECONDS, upgrade_rtf=UPGRADE_RTF,
+                 upgrade_backlog_seconds=UPGRADE_BACKLOG_SECONDS, min_dwell_seconds=MIN_DWELL_SECONDS):
+        """
+        Pick the model to transcribe with from its measured speed and the backlog.
+
+        Callers ask for `current` before each model call and report the call with record().
+        The real-time factor (RTF) of a model is its busy time divided by the audio it
+        transcribed over its last RTF_WINDOW calls. Overlapping calls, such as batched
+        workers, count their shared time once, so it measures throughput rather than
+        per-call latency.
+
+        When the current model's RTF passes downgrade_rtf or the backlog passes
+        max_backlog_seconds, the governor moves one model faster. Once a model has been
+        used for min_dwell_seconds with little backlog, it moves one model slower if that
+        model is expected to stay under upgrade_rtf. The gap between the two thresholds,
+        the dwell time and MIN_SAMPLES keep it from flapping between models. The next
+        model is loaded in the background, and the switch happens only once it is ready.
+
+        Args:
+            models: Model names to choose from, fastest first (default: MODELS)
+            initial: Model to start with (default: the first of models)
+            backlog: Optional function returning the seconds of audio waiting to be transcribed
+            downgrade_rtf, max_backlog_seconds, upgrade_rtf, upgrade_backlog_seconds,
+                min_dwell_seconds: Switching thresholds (defaults: the module constants)
+        """
+        self.models = tuple(models)
+        initial = initial or self.models[0]
+        if initial not in self.models:
+            raise ValueError(f"{initial} is not one of {self.models}")
+        self.backlog = backlog
+        self.downgrade_rtf = downgrade_rtf
+        self.max_backlog_seconds = max_backlog_seconds
+        self.upgrade_rtf = upgrade_rtf
+        self.upgrade_backlog_seconds = upgrade_backlog_seconds
+        self.min_dwell_seconds = min_dwell_seconds
+
+        self._current = initial
+        self._switched_at = time.monotonic()
+        self._samples = 0  # Calls recorded on the current model since switching to it
+        self._pending = None  # Model being loaded before a switch
+        self._calls = {name: collections.deque(maxlen=RTF_WINDOW) for name in self.models}
+        self._measured_at = {}  # model -> time.monotonic() of its last recorded call
+        self._busy_until = 0.0
+        self._switches = 0
+        self._last_reason = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """The model the next call should use."""
+        return self._current
+
+    def record(self, model_name, audio_seconds, started, finished):
+        """
+        Report a model call and switch models if the thresholds say so.
+
+        Args:
+            model_name: Model that was used
+            audio_seconds: Audio the call transcribed (new audio, for overlapping windows)
+            started, finished: time.perf_counter() before and after the call
+        """
+        if model_name not in self._calls or audio_seconds <= 0:
+            return
+        with self._lock:
+            busy = max(finished - max(started, self._busy_until), 0.0)
+            self._busy_until = max(self._busy_until, finished)
+            self._calls[model_name].append((audio_seconds, busy))
+            self._measured_at[model_name] = time.monotonic()
+            if model_name == self._current:
+                self._samples += 1
+            target, reason = self._decide()
+            if target is None or self._pending is not None:
+                return
+            self._pending = target
+        threading.Thread(target=self._switch, args=(target, reason), name="model-preload", daemon=True).start()
+
+    def rtf(self, model_name):
+        """Measured RTF of a model over its recent calls, or None if it hasn't been used."""
+        calls = self._calls.get(model_name)
+        if not calls:
+            return None
+        audio = sum(seconds for seconds, _ in calls)
+        return sum(busy for _, busy in calls) / audio if audio else None
+
+    def stats(self):
+        with self._lock:
+            rtf = self.rtf(self._current)
+            return {
+                "model": self._current,
+                "model_rtf": round(rtf, 3) if rtf is not None else None,
+                "model_switches": self._switches,
+                "model_switch_reason": self._last_reason,
+                "model_pending": self._pending,
+            }
+
+    def _decide(self):
+        """Return (model, reason) to switch to, or (None, None) to stay."""
+        if self._samples < MIN_SAMPLES:
+            return None, None
+        index = self.models.index(self._current)
+        rtf = self.rtf(self._current)
+        backlog = self.backlog() if self.backlog is not None else 0.0
+
+        if index > 0:
+            if rtf > self.downgrade_rtf:
+                return self.models[index - 1], f"rtf {rtf:.2f} > {self.downgrade_rtf}"
+            if backlog > self.max_backlog_seconds:
+                return self.models[index - 1], f"backlog {backlog:.1f}s > {self.max_backlog_seconds}s"
+
+        if (index + 1 < len(self.models)
+                and time.monotonic() - self._switched_at >= self.min_dwell_seconds
+                and backlog <= self.upgrade_backlog_seconds):
+            slower = self.models[index + 1]
+            expected = self._expected_rtf(slower, rtf)
+            if expected < self.upgrade_rtf:
+                return slower, f"expected rtf {expected:.2f} < {self.upgrade_rtf}"
+        return None, None
+
+    def _expected_rtf(self, model_name, current_rtf):
+        """Recent measured RTF of a model, else the current RTF scaled by RELATIVE_COST."""
+        measured_at = self._measured_at.get(model_name)
+        if measured_at is not None and time.monotonic() - measured_at < RTF_MEMORY_SECONDS:
+            return self.rtf(model_name)
+        cost = RELATIVE_COST.get(model_name, 1.0) / RELATIVE_COST.get(self._current, 1.0)
+        return current_rtf * cost
+
+    def _switch(self, target, reason):
+        """Load the target model, then make it current (runs on a background thread)."""
+        print(f"Switching transcription model to '{target}' ({reason})...")
+        try:
+            model_registry.warm_up(target)
+        except Exception as e:
+            print(f"Can't switch to model '{target}': {e}")
+            with self._lock:
+                self._pending = None
+                self._switched_at = time.monotonic()  # Measure again before retrying
+                self._samples = 0
+            return
+        with self._lock:
+            self._pending = None
+            self._current = target
+            self._switched_at = time.monotonic()
+            self._samples = 0
+            self._switches += 1
+            self._last_reason = reason
+        print(f"Now transcribing with model '{target}'")
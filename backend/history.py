@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class RingHistory:
+    def __init__(self, capacity, dtype=np.float32):
+        """
+        Fixed-capacity history of numbers that keeps only the newest `capacity` values.
+
+        Args:
+            capacity: Number of values kept
+            dtype: NumPy dtype of the stored values (default: float32)
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self.total = 0  # Values ever appended, including the ones that fell off
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, values):
+        """Append a batch of values in one vectorized write."""
+        values = np.asarray(values, dtype=self._data.dtype)
+        dropped = max(len(values) - self.capacity, 0)  # Would be overwritten immediately anyway
+        values = values[dropped:]
+        self.total += dropped
+
+        start = self.total % self.capacity
+        first = min(len(values), self.capacity - start)
+        self._data[start:start + first] = values[:first]
+        self._data[:len(values) - first] = values[first:]
+        self.total += len(values)
+
+    def append(self, value):
+        self.extend([value])
+
+    def recent(self, n=None):
+        """Return the newest n values (all kept values if None), oldest first, as a copy."""
+        n = len(self) if n is None else min(n, len(self))
+        end = self.total % self.capacity
+        indices = np.arange(end - n, end) % self.capacity
+        return self._data[indices]
+
+
+class DownsampledHistory:
+    def __init__(self, factor, capacity, dtype=np.float32):
+        """
+        Long-term history that stores the mean of every `factor` values.
+
+        Args:
+            factor: Number of raw values averaged into one stored value
+            capacity: Number of averaged values kept
+            dtype: NumPy dtype of the stored values (default: float32)
+        """
+        self.factor = factor
+        self.history = RingHistory(capacity, dtype)
+        self._pending = np.zeros(0, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.history)
+
+    def extend(self, values):
+        """Add raw values; every complete group of `factor` becomes one stored mean."""
+        values = np.concatenate((self._pending, np.asarray(values, dtype=np.float64)))
+        groups = len(values) // self.factor
+        if groups:
+            self.history.extend(values[:groups * self.factor].reshape(groups, self.factor).mean(axis=1))
+        self._pending = values[groups * self.factor:]
+
+    def recent(self, n=None):
+        return self.history.recent(n)
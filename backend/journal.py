@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+
+JOURNAL_NAME = "journal.jsonl"
+
+# Chunk events, in the order a chunk normally goes through them
+CAPTURED = "captured"        # Audio recorded
+ARCHIVED = "archived"        # Chunk WAV complete on disk; recovery only trusts WAVs recorded here
+TRANSCRIBED = "transcribed"  # Model result produced and chunk_N.txt written
+WRITTEN = "written"          # Segments appended to the session transcript (or chunk skipped)
+DROPPED = "dropped"          # Discarded by the queue's overflow policy
+LOST = "lost"                # Found unfinished on recovery but its audio was never saved
+FINISHED = (WRITTEN, DROPPED, LOST)
+
+
+class SessionJournal:
+    def __init__(self, path):
+        """
+        Append-only, fsync'd log of what happened to each chunk of a session directory.
+
+        Every record is one JSON line, flushed and fsync'd before record() returns, so
+        after a crash the journal says exactly which chunks were captured and which made
+        it into the transcript. replay() turns it back into a resume point.
+
+        Args:
+            path: Journal file, usually <output_dir>/journal.jsonl
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")  # End a line torn by a crash so the next record parses
+
+    def record(self, event, chunk_number, **fields):
+        line = json.dumps({"event": event, "chunk": chunk_number, "time": round(time.time(), 3), **fields})
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def replay(path):
+    """
+    Read a journal back.
+
+    Returns:
+        tuple: (next_chunk_number, unfinished) where unfinished is a list of the CAPTURED
+            records, oldest first, of chunks that never reached a finished state; their
+            "wav" is the file from the chunk's ARCHIVED record, or None if it has none
+    """
+    captured = {}
+    archived = {}
+    finished = set()
+    last_chunk = 0
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a crash mid-write
+                number = record["chunk"]
+                last_chunk = max(last_chunk, number)
+                if record["event"] == CAPTURED:
+                    captured[number] = record
+                elif record["event"] == ARCHIVED:
+                    archived[number] = record["wav"]
+                elif record["event"] in FINISHED:
+                    finished.add(number)
+    unfinished = [dict(captured[number], wav=archived.get(number))
+                  for number in sorted(captured) if number not in finished]
+    return last_chunk + 1, unfinished
@@ -0,0 +1,207 @@
+"""
+Transcribe one long recording in parallel.
+
+Example:
+    python long_transcribe.py lecture.wav --workers 4 --output lecture
+
+The audio is split at pauses into overlapping parts of about --segment-seconds, the parts
+are transcribed on several processes, and the results are merged into one Whisper-style
+result ({"text", "segments", "language"}) with timestamps relative to the whole file, saved
+as .json/.srt/.vtt/.tsv/.txt.
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_transcribe import init_worker
+from transcript_writer import TranscriptWriter, offset_segments
+from vad import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+SEGMENT_SECONDS = 300  # Target length of each part
+SEARCH_SECONDS = 30  # How far from the target a cut may move to land in a pause
+OVERLAP_SECONDS = 2  # Extra audio on each side of a cut, so words at the cut aren't lost
+MAX_DEDUP_WORDS = 8  # Longest repeated phrase removed where two parts meet
+
+
+def find_cut_points(audio, segment_seconds=SEGMENT_SECONDS, search_seconds=SEARCH_SECONDS):
+    """
+    Choose cut times (seconds) about segment_seconds apart, each in the middle of the
+    longest pause near its target, or at the quietest frame if there is no pause.
+
+    The search reaches at most half a segment from the target, and never back to the
+    previous cut, so every cut is at least segment_seconds / 2 after the one before.
+    """
+    if segment_seconds <= 0:
+        raise ValueError(f"segment_seconds must be positive, got {segment_seconds}")
+    search_seconds = min(search_seconds, segment_seconds / 2)
+    detector = VoiceActivityDetector(SAMPLE_RATE)
+    active = detector.process(audio)
+    energy = detector.last_energy
+    frame_seconds = detector.frame_seconds
+    duration = len(audio) / SAMPLE_RATE
+
+    cuts = []
+    previous_frame = -1
+    target = segment_seconds
+    while target < duration - segment_seconds / 4:
+        low = max(int((target - search_seconds) / frame_seconds), previous_frame + 1, 0)
+        high = min(int((target + search_seconds) / frame_seconds), len(active))
+        if high <= low:
+            break
+        silent = ~active[low:high]
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+        starts, ends = edges[::2], edges[1::2]
+        if len(starts):
+            i = int(np.argmax(ends - starts))
+            frame = low + (starts[i] + ends[i]) // 2
+        else:
+            frame = low + int(np.argmin(energy[low:high]))
+        previous_frame = frame
+        cut = float(frame * frame_seconds)
+        cuts.append(cut)
+        target = cut + segment_seconds
+    return cuts
+
+
+def split_audio(audio, cuts, overlap_seconds=OVERLAP_SECONDS):
+    """
+    Returns:
+        list: (start_seconds, end_seconds, keep_from, keep_until) per part; the part covers
+            [start, end) including overlap, and owns segments whose midpoint is in
+            [keep_from, keep_until)
+    """
+    duration = len(audio) / SAMPLE_RATE
+    bounds = [0.0] + list(cuts) + [duration]
+    parts = []
+    for keep_from, keep_until in zip(bounds[:-1], bounds[1:]):
+        parts.append((max(keep_from - overlap_seconds, 0.0),
+                      min(keep_until + overlap_seconds, duration),
+                      keep_from, keep_until))
+    return parts
+
+
+def transcribe_part(audio, offset, model_name):
+    """Transcribe one part in a worker and shift its timestamps by `offset` seconds."""
+    import model_registry
+    import transcription_cache
+
+    model = model_registry.get_model(model_name)
+    result = transcription_cache.transcribe_cached(
+        audio, model_name, {"task": "transcribe"},
+        lambda: model.transcribe(audio, fp16=model_registry.is_fp16(model)))
+    offset_segments(result["segments"], offset)
+    return result
+
+
+def _words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def _drop_repeated_prefix(previous_text, text):
+    """Remove words at the start of `text` that repeat the end of `previous_text`."""
+    tail = _words(previous_text)[-MAX_DEDUP_WORDS:]
+    head = _words(text)[:MAX_DEDUP_WORDS]
+    for n in range(min(len(tail), len(head)), 0, -1):
+        if tail[-n:] == head[:n]:
+            # Cut the original text after its n-th word, keeping punctuation and spacing
+            matches = list(re.finditer(r"[\w']+", text))
+            return text[matches[n - 1].end():].lstrip(" ,.;:")
+    return text
+
+
+def merge_results(results, parts):
+    """
+    Merge per-part results into one Whisper result.
+
+    Each part keeps only the segments centred inside its own range, so the overlap is
+    transcribed twice but emitted once; a phrase repeated right at a seam is removed.
+    """
+    segments = []
+    for result, (_, _, keep_from, keep_until) in zip(results, parts):
+        kept = [segment for segment in result["segments"]
+                if keep_from <= (segment["start"] + segment["end"]) / 2 < keep_until]
+        if segments and kept:
+            text = _drop_repeated_prefix(segments[-1]["text"], kept[0]["text"])
+            if not text.strip():
+                kept = kept[1:]
+            else:
+                kept[0]["text"] = " " + text if not text.startswith(" ") else text
+        segments.extend(kept)
+
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+
+    languages = [result.get("language") for result in results if result.get("language")]
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": max(set(languages), key=languages.count) if languages else None,
+    }
+
+
+def transcribe_long(audio, model_name="base", workers=None, segment_seconds=SEGMENT_SECONDS,
+                    overlap_seconds=OVERLAP_SECONDS):
+    """
+    Transcribe a float32 16 kHz mono array in parallel parts.
+
+    Returns:
+        dict: Whisper-style result with global timestamps
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    cuts = find_cut_points(audio, segment_seconds)
+    parts = split_audio(audio, cuts, overlap_seconds)
+    print(f"Split {len(audio) / SAMPLE_RATE:.1f}s of audio into {len(parts)} parts")
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(parts)), initializer=init_worker,
+                             initargs=(model_name, threads_per_worker)) as executor:
+        futures = [executor.submit(transcribe_part,
+                                   audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)],
+                                   start, model_name)
+                   for start, end, _, _ in parts]
+        results = [future.result() for future in futures]
+    return merge_results(results, parts)
+
+
+def _positive_seconds(value):
+    seconds = float(value)
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number of seconds, got {value}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a long recording in parallel parts.")
+    parser.add_argument("audio", help="Audio file to transcribe")
+    parser.add_argument("--model", default="base", help="Whisper model name (default: base)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: half the CPUs)")
+    parser.add_argument("--segment-seconds", type=_positive_seconds, default=SEGMENT_SECONDS,
+                        help=f"Approximate length of each part (default: {SEGMENT_SECONDS})")
+    parser.add_argument("--overlap-seconds", type=float, default=OVERLAP_SECONDS,
+                        help=f"Overlap on each side of a cut (default: {OVERLAP_SECONDS})")
+    parser.add_argument("--output", help="Output path without extension (default: next to the audio)")
+    args = parser.parse_args()
+
+    import whisper
+
+    audio = whisper.load_audio(args.audio)
+    start = time.perf_counter()
+    result = transcribe_long(audio, args.model, args.workers, args.segment_seconds, args.overlap_seconds)
+    elapsed = time.perf_counter() - start
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Transcribed {duration:.1f}s in {elapsed:.1f}s (RTF {elapsed / duration:.3f})")
+
+    output = args.output or os.path.splitext(args.audio)[0]
+    writer = TranscriptWriter(output)
+    writer.add(1, result["segments"], language=result["language"])
+    writer.close()
+    print(f"Saved transcription to {output}.json/.srt/.vtt/.tsv/.txt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+ENABLED = True  # Set to False to turn every observation into a no-op
+PREFIX = "zoombudz_"  # Prepended to every exported metric name
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+BACKLOG_BUCKETS = (0, 1, 5, 10, 30, 60, 120, 300, 600)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+PROFILE_INTERVAL_SECONDS = 0.01  # Default time between profiler samples
+MAX_PROFILE_STACKS = 10000  # Distinct stacks kept by the profiler; rarer new ones are counted as "other"
+
+_histograms = []
+_gauges = []
+_lock = threading.Lock()
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        """
+        Distribution of observed values, exported like a Prometheus histogram.
+
+        Observing is a bisect and a few additions under a lock, cheap enough for the
+        capture callback. One series is kept per combination of label values.
+
+        Args:
+            name: Metric name without PREFIX
+            help: One-line description shown by /metrics
+            buckets: Sorted upper bounds of the buckets (+Inf is added)
+            labels: Names of the labels every observation passes as keywords
+        """
+        self.name = PREFIX + name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        with _lock:
+            _histograms.append(self)
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(str(labels[name]) for name in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 3)
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing how long its block took, in seconds."""
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, values in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                bucket_labels = ",".join(labels + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def register_gauge(name, help, collect):
+    """
+    Export current values read at scrape time, e.g. a queue's depth right now.
+
+    Args:
+        name: Metric name without PREFIX
+        help: One-line description shown by /metrics
+        collect: Function returning a list of (labels_dict, value)
+    """
+    with _lock:
+        _gauges.append((PREFIX + name, help, collect))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = list(_histograms)
+        gauges = list(_gauges)
+    lines = []
+    for histogram in histograms:
+        lines.extend(histogram.render())
+    for name, help, collect in gauges:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"Error collecting {name}: {e}")
+            continue
+        for labels, value in values:
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Time spent in each stage of the recording pipelines, per call
+STAGE_SECONDS = Histogram("stage_seconds", "Time spent in one call of a pipeline stage.",
+                          STAGE_BUCKETS, labels=("stage",))
+# Items waiting in a queue, sampled as work is added to it or taken from it
+QUEUE_DEPTH = Histogram("queue_depth", "Items waiting in a queue, sampled as work is added or taken.",
+                        DEPTH_BUCKETS, labels=("queue",))
+# Audio captured but not yet transcribed, sampled whenever a chunk is queued
+BACKLOG_SECONDS = Histogram("backlog_seconds", "Seconds of audio waiting to be transcribed when a chunk is queued.",
+                            BACKLOG_BUCKETS)
+# Inference time divided by audio duration (below 1 is faster than real time)
+MODEL_RTF = Histogram("model_rtf", "Real-time factor of one model call.", RTF_BUCKETS, labels=("model",))
+
+
+class SamplingProfiler:
+    def __init__(self):
+        """
+        Statistical profiler that samples the stacks of all threads at a fixed interval.
+
+        It is off until start() is called, and sampling only reads frames, so the
+        threads being profiled are not slowed down beyond holding the GIL briefly.
+        report() returns "folded" stacks (thread;outer;...;inner count), which flame
+        graph tools such as flamegraph.pl and speedscope read directly.
+        """
+        self.interval = PROFILE_INTERVAL_SECONDS
+        self.samples = 0
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self, interval=PROFILE_INTERVAL_SECONDS):
+        """Start sampling, discarding the samples of an earlier run."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.interval = interval
+            self.samples = 0
+            self._stacks = Counter()
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return the report."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        return self.report()
+
+    def status(self):
+        return {"running": self.is_running, "interval": self.interval, "samples": self.samples,
+                "started_at": self.started_at}
+
+    def report(self):
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    key = ";".join([names.get(ident, str(ident))] + stack[::-1])
+                    if key not in self._stacks and len(self._stacks) >= MAX_PROFILE_STACKS:
+                        key = names.get(ident, str(ident)) + ";other"
+                    self._stacks[key] += 1
+                self.samples += 1
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,343 @@
+import gc
+import importlib
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+
+import metrics
+
+DEFAULT_MODEL = "base"  # Use "tiny", "base", "small", "medium", or "large"
+WARMUP_SECONDS = 1  # Length of the silent clip used to warm up a freshly loaded model
+
+_models = {}        # (name, device, precision) -> loaded model
+_last_used = {}     # (name, device, precision) -> time.monotonic() of last get_model()
+_load_locks = {}    # (name, device, precision) -> lock held while that model loads
+_inference_locks = weakref.WeakKeyDictionary()  # model -> lock held around each of its transcribe/decode calls
+_precisions = weakref.WeakKeyDictionary()  # model -> precision it was loaded for
+_lock = threading.Lock()
+_max_models = None  # None means no limit on the number of resident models
+_cpu_precision = "fp32"  # Precision of CPU models when the caller doesn't say; "int8" after enable_cpu_profile()
+_warm_up_status = {"state": "idle", "model": None, "stage": None, "stage_seconds": {}, "error": None}
+
+# torch and whisper take seconds to import, so they are imported on first use rather than
+# with this module; importing it (e.g. when the server starts) stays fast.
+
+
+def _default_device():
+    """Pick the device a model should live on when the caller doesn't say."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _make_key(name, device, precision):
+    """Normalize a (name, device, precision) triple into a registry key."""
+    device = device or _default_device()
+    if device == "cpu":
+        # Half precision is not supported on CPU; int8 is dynamic quantization of the Linear layers
+        precision = "int8" if (precision or _cpu_precision) == "int8" else "fp32"
+    elif precision is None or precision == "int8":
+        precision = "fp16"  # Dynamic quantization only runs on CPU
+    return (name, device, precision)
+
+
+def get_model(name=DEFAULT_MODEL, device=None, precision=None):
+    """
+    Return the shared Whisper model for (name, device, precision), loading it once.
+
+    Concurrent callers asking for the same model wait on a per-model lock, so the
+    weights are read from disk a single time and every caller gets the same instance.
+    """
+    key = _make_key(name, device, precision)
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _last_used[key] = time.monotonic()
+            return model
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _lock:
+            model = _models.get(key)
+            if model is not None:
+                # Another caller finished loading it while we waited
+                _last_used[key] = time.monotonic()
+                return model
+
+        print(f"Loading Whisper model '{key[0]}' on {key[1]} ({key[2]})...")
+        import whisper
+        with metrics.STAGE_SECONDS.time(stage="model_load"):
+            # fp16 models keep whisper's fp32 weights: its layers cast them to the input dtype
+            # and LayerNorm runs in fp32, so half precision is chosen per call (see is_fp16)
+            model = whisper.load_model(key[0], device=key[1])
+            if key[2] == "int8":
+                model = quantize(model)
+        with _lock:
+            _models[key] = model
+            _precisions[model] = key[2]
+            _last_used[key] = time.monotonic()
+            evicted = _evict_over_capacity(keep=key)
+
+    if evicted:
+        _release_memory()
+    return model
+
+
+def quantize(model):
+    """
+    Apply dynamic int8 quantization to a CPU model's Linear layers.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up
+    the attention and MLP matrix products that dominate CPU inference. Convolutions and
+    embeddings stay fp32.
+    """
+    import torch
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            # Whisper's Linear subclass only casts dtypes; quantize_dynamic needs the base class
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def configure_cpu_threads(workers=1, intra_threads=None, inter_threads=1):
+    """
+    Pin torch's CPU thread pools so `workers` concurrent transcriptions share the cores.
+
+    By default every model call may use all cores, so N workers run N times as many
+    threads as there are cores and spend their time switching between them.
+
+    Returns:
+        int: Intra-op threads each worker's model calls use
+    """
+    import torch
+    intra_threads = intra_threads or max(1, (os.cpu_count() or 1) // max(workers, 1))
+    torch.set_num_threads(intra_threads)
+    try:
+        torch.set_num_interop_threads(inter_threads)
+    except RuntimeError:
+        pass  # Can only be set once, before any inter-op work has started
+    return intra_threads
+
+
+def enable_cpu_profile(workers=1, quantize_models=True):
+    """
+    Tune inference for CPU-only hosts: int8 models and thread pools split between workers.
+
+    Models loaded afterwards without an explicit precision are quantized (see quantize).
+    Does nothing when a GPU is available.
+
+    Returns:
+        int: Intra-op threads per worker, or None if a GPU is used
+    """
+    global _cpu_precision
+    if _default_device() != "cpu":
+        return None
+    if quantize_models:
+        _cpu_precision = "int8"
+    threads = configure_cpu_threads(workers)
+    print(f"CPU inference profile: {_cpu_precision}, {threads} threads for each of {workers} workers")
+    return threads
+
+
+def default_precision(device=None):
+    """Precision get_model() uses for a device when the caller doesn't pass one."""
+    return _make_key(None, device, None)[2]
+
+
+def is_fp16(model):
+    """
+    Return True if the model should run in half precision (pass as fp16= to transcribe
+    and DecodingOptions).
+
+    That is the case for registry models loaded as "fp16" and, for models loaded
+    elsewhere, whenever the model is on a GPU.
+    """
+    precision = _precisions.get(model)
+    if precision is not None:
+        return precision == "fp16"
+    return model.device.type == "cuda"
+
+
+def inference_lock(model):
+    """
+    Lock to hold around every transcribe/decode call on a model instance.
+
+    Whisper installs its kv-cache hooks on the model's decoder modules for the length of
+    a decode, so two decodes running at once on one instance corrupt each other (wrong
+    tokens, KeyError or shape errors). Workers sharing a registry model take turns on it.
+    The lock is reentrant, so a caller holding it may call transcribe() again.
+    """
+    with _lock:
+        lock = _inference_locks.get(model)
+        if lock is None:
+            lock = _inference_locks[model] = threading.RLock()
+        return lock
+
+
+def transcribe(model, audio, **options):
+    """model.transcribe() while holding the model's inference lock, in half precision on a GPU."""
+    with inference_lock(model):
+        return model.transcribe(audio, fp16=is_fp16(model), **options)
+
+
+def warm_up(name=DEFAULT_MODEL, device=None, precision=None):
+    """
+    Load a model and run one short transcription so the first real chunk doesn't
+    pay for lazy CUDA/kernel initialization.
+
+    The transcription holds the model's inference lock, so it is safe while recordings
+    that started before the model was ready already decode on it.
+    """
+    import whisper
+    model = get_model(name, device, precision)
+    silence = np.zeros(whisper.audio.SAMPLE_RATE * WARMUP_SECONDS, dtype=np.float32)
+    start = time.perf_counter()
+    transcribe(model, silence)
+    print(f"Warmed up Whisper model '{name}' in {time.perf_counter() - start:.2f}s")
+    return model
+
+
+def start_warm_up(name=DEFAULT_MODEL, device=None, precision=None, prepare=None):
+    """
+    Import torch and whisper, load a model and warm it up on a background thread.
+
+    Progress is reported by warm_up_status(), so a server can start answering requests
+    right away and tell clients when transcription is ready. Callers that need the model
+    before it is ready wait for it in get_model(), then take turns with the warm-up run
+    on its inference lock.
+
+    Args:
+        name, device, precision: Model to load (as for get_model)
+        prepare: Optional function run before the model is loaded, e.g. to import other
+            dependencies or apply enable_cpu_profile()
+
+    Returns:
+        threading.Thread: The warm-up thread
+    """
+    with _lock:
+        if _warm_up_status["state"] in ("importing", "loading", "warming"):
+            return None
+        _warm_up_status.update(state="importing", model=name, stage=None, stage_seconds={}, error=None)
+    thread = threading.Thread(target=_warm_up_in_background, args=(name, device, precision, prepare),
+                              name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_up_status():
+    """
+    Progress of start_warm_up().
+
+    Returns:
+        dict: {"state": "idle" | "importing" | "loading" | "warming" | "ready" | "failed",
+               "model", "stage_seconds" (time taken by each finished stage),
+               "elapsed_seconds" (time in the current stage), "error"}
+    """
+    with _lock:
+        status = dict(_warm_up_status, stage_seconds=dict(_warm_up_status["stage_seconds"]))
+    stage = status.pop("stage")
+    status["elapsed_seconds"] = round(time.monotonic() - stage, 3) if stage is not None else None
+    return status
+
+
+def _warm_up_in_background(name, device, precision, prepare):
+    def stage(state, run):
+        with _lock:
+            _warm_up_status.update(state=state, stage=time.monotonic())
+        started = time.perf_counter()
+        run()
+        with _lock:
+            _warm_up_status["stage_seconds"][state] = round(time.perf_counter() - started, 3)
+
+    def import_dependencies():
+        # Imported only to pay their import time here; the functions above import them again
+        for module in ("torch", "whisper"):
+            importlib.import_module(module)
+        if prepare is not None:
+            prepare()
+
+    try:
+        stage("importing", import_dependencies)
+        stage("loading", lambda: get_model(name, device, precision))
+        stage("warming", lambda: warm_up(name, device, precision))
+    except Exception as e:
+        print(f"Error warming up Whisper model '{name}': {e}")
+        with _lock:
+            _warm_up_status.update(state="failed", stage=None, error=str(e))
+        return
+    with _lock:
+        _warm_up_status.update(state="ready", stage=None)
+
+
+def loaded_models():
+    """Return the keys of all resident models, least recently used first."""
+    with _lock:
+        return sorted(_models, key=lambda key: _last_used.get(key, 0))
+
+
+def set_max_models(max_models):
+    """
+    Limit how many models may be resident at once (None for no limit).
+
+    When a new model is loaded past the limit, the least recently used ones are evicted.
+    """
+    global _max_models
+    with _lock:
+        _max_models = max_models
+        evicted = _evict_over_capacity()
+    if evicted:
+        _release_memory()
+
+
+def evict(name=None, device=None, precision=None):
+    """
+    Drop matching models from the registry to free memory.
+
+    Any argument left as None matches everything, so evict() clears the registry.
+    Callers still holding a reference keep their instance alive until they drop it.
+
+    Returns:
+        list: Keys of the evicted models
+    """
+    with _lock:
+        evicted = [key for key in _models
+                   if (name is None or key[0] == name)
+                   and (device is None or key[1] == device)
+                   and (precision is None or key[2] == precision)]
+        for key in evicted:
+            _drop(key)
+    if evicted:
+        _release_memory()
+    return evicted
+
+
+def _evict_over_capacity(keep=None):
+    """Evict least recently used models beyond _max_models. Caller must hold _lock."""
+    evicted = []
+    if _max_models is None:
+        return evicted
+    candidates = sorted((key for key in _models if key != keep), key=lambda key: _last_used.get(key, 0))
+    while len(_models) > _max_models and candidates:
+        key = candidates.pop(0)
+        print(f"Evicting Whisper model '{key[0]}' on {key[1]} ({key[2]})")
+        _drop(key)
+        evicted.append(key)
+    return evicted
+
+
+def _drop(key):
+    """Remove a model from the registry. Caller must hold _lock."""
+    _models.pop(key, None)
+    _last_used.pop(key, None)
+    _load_locks.pop(key, None)
+
+
+def _release_memory():
+    """Give memory from evicted models back to the allocator."""
+    gc.collect()
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
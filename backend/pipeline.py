@@ -0,0 +1,453 @@
+import queue
+import threading
+import time
+
+import metrics
+
+# What the capture stage does when the chunk queue is full
+BLOCK = "block"              # Wait for a free slot (capture stalls, audio may be lost upstream)
+DROP_OLDEST = "drop_oldest"  # Discard the oldest queued chunk to make room for the new one
+DROP_NEWEST = "drop_newest"  # Discard the chunk that was just captured
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+_STOP = object()  # Sentinel telling a worker to exit
+
+# Pipeline states reported by stats()
+IDLE = "idle"
+RUNNING = "running"
+STOPPING = "stopping"  # Capture has ended; queued and in-flight chunks are still being transcribed
+STOPPED = "stopped"
+
+
+class CancellationToken:
+    """Flag shared by the pipeline stages telling them to wind down as soon as they can."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Set the flag and run the on_cancel callbacks (once)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call `callback` when the token is cancelled (immediately if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout=None):
+        """Block until cancelled or timeout; returns True if cancelled."""
+        return self._event.wait(timeout)
+
+
+class AudioChunk:
+    """A captured piece of audio waiting to be transcribed."""
+
+    def __init__(self, number, audio, duration, start=None):
+        self.number = number
+        self.audio = audio          # Whatever the capture function produced (e.g. a WAV path)
+        self.duration = duration    # Seconds of audio in the chunk
+        self.start = start          # Offset of the chunk in the recording, if known
+        self.captured_at = time.monotonic()
+
+
+class TranscriptionPipeline:
+    def __init__(self, capture_chunk, transcribe_chunk, num_workers=2, max_queued_chunks=4,
+                 overflow_policy=DROP_OLDEST, first_chunk_number=1, on_stop=None,
+                 extra_stats=None, on_drop=None, worker_pool=None, cancel_token=None,
+                 backlog=None):
+        """
+        Producer/consumer pipeline that keeps capturing while earlier chunks are transcribed.
+
+        Args:
+            capture_chunk: Function (chunk_number) -> (audio, duration_seconds[, start_seconds])
+                that records one chunk, or None when the stream has ended
+            transcribe_chunk: Function (AudioChunk) -> None run by the worker threads
+            num_workers: Number of transcription worker threads (default: 2)
+            max_queued_chunks: Capacity of the chunk queue between the stages (default: 4)
+            overflow_policy: BLOCK, DROP_OLDEST or DROP_NEWEST when the queue is full
+            first_chunk_number: Number given to the first captured chunk (default: 1)
+            on_stop: Optional function called once all workers have finished
+            extra_stats: Optional function returning a dict merged into stats()
+            on_drop: Optional function (AudioChunk) called for each chunk the overflow policy discards
+            worker_pool: Optional SharedWorkerPool; if given, chunks are transcribed by the
+                pool's workers (shared with other pipelines) and num_workers is ignored
+            cancel_token: CancellationToken shared with the capture function so it can cut
+                the current chunk short on stop(). capture_chunk must then return None once
+                it has delivered its last chunk. Without one, capture simply stops after the
+                chunk being recorded.
+            backlog: Optional iterable of (chunk_number, audio, duration, start) for chunks
+                from an earlier run; they are queued from a separate thread alongside live
+                capture (waiting for space rather than dropping) until stop(). Once queued,
+                DROP_OLDEST may still evict them for live chunks; on_drop is told as usual
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.capture_chunk = capture_chunk
+        self.transcribe_chunk = transcribe_chunk
+        self.num_workers = num_workers
+        self.overflow_policy = overflow_policy
+        self.next_chunk_number = first_chunk_number
+        self.on_stop = on_stop
+        self.extra_stats = extra_stats
+        self.on_drop = on_drop
+        self.worker_pool = worker_pool
+        self.cancel_token = cancel_token or CancellationToken()
+        self._capture_drains = cancel_token is not None  # capture_chunk ends the stream itself
+        self.backlog = backlog
+        self._backlog_thread = None
+        self.state = IDLE
+
+        self.chunk_queue = queue.Queue(maxsize=max_queued_chunks)
+        self.is_running = False
+        self._capture_thread = None
+        self._finisher = None
+        self._state_lock = threading.Lock()
+        self._workers = []
+
+        # Statistics, guarded by _stats_lock
+        self._stats_lock = threading.Lock()
+        self._captured = 0
+        self._transcribed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._in_flight = {}        # chunk number -> AudioChunk being transcribed
+        self._queued_seconds = 0.0  # Audio duration sitting in the queue
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+
+    def start(self):
+        """Start the capture thread and the transcription workers."""
+        if self._capture_thread is not None:
+            return
+        self.is_running = True
+        self.state = RUNNING
+
+        self._workers = []
+        if self.worker_pool is not None:
+            self.worker_pool.register(self)
+        for i in range(0 if self.worker_pool is not None else self.num_workers):
+            worker = threading.Thread(target=self._transcription_worker, name=f"transcriber-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="capture")
+        self._capture_thread.daemon = True
+        self._capture_thread.start()
+
+        if self.backlog is not None:
+            self._backlog_thread = threading.Thread(target=self._backlog_loop, name="backlog")
+            self._backlog_thread.daemon = True
+            self._backlog_thread.start()
+
+    def stop(self, wait=True):
+        """
+        Stop capturing and have every queued chunk transcribed.
+
+        Capture is cancelled through cancel_token, so the chunk being recorded is cut short,
+        queued and transcribed like the others; this always waits for capture to end. With
+        wait=False it then returns, and the rest (transcribing the backlog, on_stop) carries
+        on in the background: state is STOPPING until it is done, then STOPPED.
+        """
+        with self._state_lock:
+            if self._capture_thread is None:
+                return
+            if self._finisher is None:
+                self.is_running = False
+                self.state = STOPPING
+                self.cancel_token.cancel()
+                self._finisher = threading.Thread(target=self._finish, name="pipeline-finish")
+                self._finisher.daemon = True
+                self._finisher.start()
+        self._capture_thread.join()
+        if wait:
+            self._finisher.join()
+
+    @property
+    def queued_seconds(self):
+        """Seconds of audio waiting for a worker."""
+        with self._stats_lock:
+            return self._queued_seconds
+
+    @property
+    def backlog_seconds(self):
+        """Seconds of audio queued or being transcribed."""
+        with self._stats_lock:
+            return self._queued_seconds + sum(chunk.duration for chunk in self._in_flight.values())
+
+    def wait_stopped(self, timeout=None):
+        """Wait for a stop() to finish; returns True if the pipeline is fully stopped."""
+        finisher = self._finisher
+        if finisher is not None:
+            finisher.join(timeout)
+        return self.state == STOPPED
+
+    def _finish(self):
+        """Wait for capture to end and the backlog to be transcribed, then clean up."""
+        self._capture_thread.join()
+        if self._backlog_thread is not None:
+            self._backlog_thread.join()
+
+        if self.worker_pool is not None:
+            self.chunk_queue.join()  # Every chunk taken by the pool has been transcribed
+            self.worker_pool.unregister(self)
+        for _ in self._workers:
+            self.chunk_queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+        try:
+            if self.on_stop is not None:
+                self.on_stop()
+        finally:
+            self.state = STOPPED
+
+    def stats(self):
+        """
+        Get a snapshot of pipeline health.
+
+        Returns:
+            dict: Counters, queue depth and transcription lag in seconds
+        """
+        with self._stats_lock:
+            in_flight_seconds = sum(chunk.duration for chunk in self._in_flight.values())
+            done = self._transcribed + self._failed
+            stats = {
+                "is_running": self.is_running,
+                "state": self.state,
+                "queue_depth": self.chunk_queue.qsize(),
+                "queue_capacity": self.chunk_queue.maxsize,
+                "overflow_policy": self.overflow_policy,
+                "workers": self.num_workers if self.worker_pool is None else self.worker_pool.num_workers,
+                "in_flight": len(self._in_flight),
+                "captured": self._captured,
+                "transcribed": self._transcribed,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "backlog_seconds": round(self._queued_seconds + in_flight_seconds, 3),
+                "last_lag_seconds": round(self._last_lag, 3),
+                "max_lag_seconds": round(self._max_lag, 3),
+                "avg_lag_seconds": round(self._total_lag / done, 3) if done else 0.0,
+                "next_chunk_number": self.next_chunk_number,
+            }
+        if self.extra_stats is not None:
+            stats.update(self.extra_stats())
+        return stats
+
+    def _capture_loop(self):
+        """Record chunks back to back and hand them to the workers."""
+        while self._capture_drains or not self.cancel_token.cancelled:
+            number = self.next_chunk_number
+            try:
+                captured = self.capture_chunk(number)
+            except Exception as e:
+                print(f"Error capturing chunk {number}: {e}")
+                self.is_running = False
+                break
+            if captured is None:
+                self.is_running = False  # End of stream
+                break
+            chunk = AudioChunk(number, *captured)
+            self.next_chunk_number += 1
+
+            with self._stats_lock:
+                self._captured += 1
+            self._enqueue(chunk)
+
+    def _backlog_loop(self):
+        """Queue chunks left over from an earlier run until they are all queued or we stop."""
+        for number, audio, duration, start in self.backlog:
+            if self.cancel_token.cancelled:
+                break
+            chunk = AudioChunk(number, audio, duration, start)
+            with self._stats_lock:
+                self._queued_seconds += duration
+            self.chunk_queue.put(chunk)
+            self._queued(chunk)
+
+    def _enqueue(self, chunk):
+        """Put a chunk on the queue, applying the overflow policy if it is full."""
+        with self._stats_lock:
+            self._queued_seconds += chunk.duration
+
+        if self.overflow_policy == BLOCK:
+            self.chunk_queue.put(chunk)
+            self._queued(chunk)
+            return
+
+        while True:
+            try:
+                self.chunk_queue.put_nowait(chunk)
+                self._queued(chunk)
+                return
+            except queue.Full:
+                pass
+            try:
+                dropped = chunk if self.overflow_policy == DROP_NEWEST else self.chunk_queue.get_nowait()
+            except queue.Empty:
+                continue  # A worker freed a slot in the meantime
+            if dropped is not chunk:
+                self.chunk_queue.task_done()
+            print(f"Transcription queue full, dropping chunk {dropped.number}")
+            with self._stats_lock:
+                self._dropped += 1
+                self._queued_seconds -= dropped.duration
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+            if dropped is chunk:
+                return
+
+    def _queued(self, chunk):
+        """Record queue depth and backlog for a chunk just queued, and wake a shared worker."""
+        metrics.QUEUE_DEPTH.observe(self.chunk_queue.qsize(), queue="chunks")
+        metrics.BACKLOG_SECONDS.observe(self.backlog_seconds)
+        self._notify_pool()
+
+    def _notify_pool(self):
+        if self.worker_pool is not None:
+            self.worker_pool.notify()
+
+    def _transcription_worker(self):
+        """Take chunks off the queue and transcribe them until told to stop."""
+        while True:
+            chunk = self.chunk_queue.get()
+            if chunk is _STOP:
+                break
+            self._process(chunk)
+
+    def _process(self, chunk):
+        """Transcribe one chunk taken off the queue and record the outcome."""
+        with self._stats_lock:
+            self._queued_seconds -= chunk.duration
+            self._in_flight[chunk.number] = chunk
+        metrics.STAGE_SECONDS.observe(time.monotonic() - chunk.captured_at, stage="queue_wait")
+
+        failed = False
+        try:
+            with metrics.STAGE_SECONDS.time(stage="transcribe_chunk"):
+                self.transcribe_chunk(chunk)
+        except Exception as e:
+            failed = True
+            print(f"Error transcribing chunk {chunk.number}: {e}")
+
+        lag = time.monotonic() - chunk.captured_at
+        with self._stats_lock:
+            del self._in_flight[chunk.number]
+            if failed:
+                self._failed += 1
+            else:
+                self._transcribed += 1
+            self._last_lag = lag
+            self._max_lag = max(self._max_lag, lag)
+            self._total_lag += lag
+        self.chunk_queue.task_done()
+
+
+class SharedWorkerPool:
+    def __init__(self, num_workers=2):
+        """
+        Transcription workers shared by several pipelines (e.g. one per recording session).
+
+        Workers serve the registered pipelines' queues round-robin, one chunk at a time, so
+        a session with a long backlog can't starve the others. Pipelines keep their own
+        queue and overflow policy.
+
+        Workers of different sessions transcribe on the same registry model, so their model
+        calls must hold model_registry.inference_lock (audio_handler._run_model does, with or
+        without batching); the rest of the chunk's processing still runs in parallel.
+
+        Args:
+            num_workers: Number of worker threads (default: 2)
+        """
+        self.num_workers = num_workers
+        self._pipelines = []
+        self._next = 0  # Index of the pipeline served first on the next pick
+        self._busy = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker, name=f"shared-transcriber-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def register(self, pipeline):
+        with self._cond:
+            self._pipelines.append(pipeline)
+            self._cond.notify_all()
+
+    def unregister(self, pipeline):
+        with self._cond:
+            if pipeline in self._pipelines:
+                self._pipelines.remove(pipeline)
+
+    def notify(self):
+        """Wake a worker because a registered pipeline queued a chunk."""
+        with self._cond:
+            self._cond.notify()
+
+    def close(self):
+        """Stop the workers once they finish the chunk they are on."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.num_workers,
+                "busy_workers": self._busy,
+                "pipelines": len(self._pipelines),
+                "queued_chunks": sum(p.chunk_queue.qsize() for p in self._pipelines),
+            }
+
+    def _take(self):
+        """Return (pipeline, chunk) from the next pipeline with work, or (None, None)."""
+        count = len(self._pipelines)
+        for i in range(count):
+            pipeline = self._pipelines[(self._next + i) % count]
+            try:
+                chunk = pipeline.chunk_queue.get_nowait()
+            except queue.Empty:
+                continue
+            self._next = (self._next + i + 1) % count
+            return pipeline, chunk
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    pipeline, chunk = self._take()
+                    if chunk is not None:
+                        break
+                    self._cond.wait()
+                self._busy += 1
+            try:
+                pipeline._process(chunk)
+            finally:
+                with self._cond:
+                    self._busy -= 1
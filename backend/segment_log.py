@@ -0,0 +1,71 @@
+import collections
+import itertools
+import threading
+
+MAX_SEGMENTS = 100000  # Segments kept in memory; older ones can still be read from the transcript files
+
+
+class SegmentLog:
+    def __init__(self, max_segments=MAX_SEGMENTS):
+        """
+        In-memory, append-only log of transcribed segments for live clients.
+
+        Every segment gets an increasing offset, so a client only asks for what it hasn't
+        seen yet (since=offset) instead of re-downloading the transcript. Readers can block
+        until new segments arrive, which is what the streaming endpoint uses.
+
+        Args:
+            max_segments: Newest segments kept in memory (default: MAX_SEGMENTS)
+        """
+        self._segments = collections.deque(maxlen=max_segments)
+        self._next_offset = 0
+        self._cond = threading.Condition()
+
+    @property
+    def next_offset(self):
+        """Offset the next appended segment will get."""
+        return self._next_offset
+
+    @property
+    def first_offset(self):
+        """Offset of the oldest segment still in memory."""
+        with self._cond:
+            return self._next_offset - len(self._segments)
+
+    def extend(self, segments, session=None):
+        """Append Whisper segments (times relative to their session) and wake up readers."""
+        with self._cond:
+            for segment in segments:
+                self._segments.append({
+                    "offset": self._next_offset,
+                    "session": session,
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": segment["text"].strip(),
+                    "model": segment.get("model"),
+                })
+                self._next_offset += 1
+            self._cond.notify_all()
+
+    def since(self, offset=0, limit=None):
+        """
+        Returns:
+            list: Segments with offset >= `offset`, oldest first (at most `limit`)
+        """
+        with self._cond:
+            first = self._next_offset - len(self._segments)
+            new = len(self._segments) - max(offset - first, 0)
+            # Walk from the newest end: clients almost always ask for the last few segments
+            segments = list(itertools.islice(reversed(self._segments), max(new, 0)))[::-1]
+        return segments if limit is None else segments[:limit]
+
+    def wait(self, offset, timeout=None):
+        """
+        Block until a segment with offset >= `offset` exists (or timeout).
+
+        Returns:
+            list: The new segments, empty on timeout
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_offset > offset, timeout)
+        return self.since(offset)
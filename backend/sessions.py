@@ -0,0 +1,170 @@
+import os
+import threading
+import uuid
+
+import audio_handler
+from pipeline import SharedWorkerPool, STOPPED
+
+SESSIONS_DIR = "sessions"  # Default parent directory for the output of sessions without their own
+
+
+class RecordingSession:
+    def __init__(self, session_id, device_index, output_dir, first_chunk_number=1):
+        """
+        One recording: a capture device, an output directory and a pipeline.
+
+        Args:
+            session_id: Key of the session in the SessionManager
+            device_index: Input device to record from
+            output_dir: Directory for chunk WAVs, chunk texts and session transcripts
+            first_chunk_number: Number given to the first chunk (default: 1)
+        """
+        self.session_id = session_id
+        self.device_index = device_index
+        self.output_dir = output_dir
+        self.next_chunk_number = first_chunk_number
+        self.pipeline = None
+        self._finishing = []  # Stopped pipelines still transcribing their backlog
+        self._lock = threading.Lock()
+
+    @property
+    def is_recording(self):
+        return self.pipeline is not None
+
+    def start(self, worker_pool, segment_log=None):
+        """
+        Start recording. If an earlier stop(wait=False) is still transcribing its backlog,
+        wait for it first: its queued chunks are unfinished in the journal, and the new
+        pipeline would otherwise recover and transcribe them a second time.
+        """
+        with self._lock:
+            if self.pipeline is not None:
+                return
+            for pipeline in self._finishing:
+                pipeline.wait_stopped()
+            self._finishing = []
+            self.pipeline = audio_handler.create_pipeline(self.next_chunk_number, self.device_index,
+                                                          segment_log, self.output_dir, worker_pool,
+                                                          self.session_id)
+            self.pipeline.start()
+
+    def stop(self, wait=True):
+        """Stop recording; with wait=False, queued chunks are transcribed in the background."""
+        with self._lock:
+            if self.pipeline is None:
+                return
+            self.pipeline.stop(wait)
+            self.next_chunk_number = self.pipeline.next_chunk_number
+            if not wait:
+                self._finishing.append(self.pipeline)
+            self.pipeline = None
+
+    @property
+    def state(self):
+        if self.pipeline is not None:
+            return "recording"
+        self._finishing = [p for p in self._finishing if p.state != STOPPED]
+        return "finishing" if self._finishing else "stopped"
+
+    def info(self):
+        info = {
+            "id": self.session_id,
+            "device_index": self.device_index,
+            "output_dir": self.output_dir,
+            "is_recording": self.is_recording,
+            "is_running": self.is_recording,
+            "state": self.state,
+            "next_chunk_number": self.next_chunk_number,
+        }
+        if self.pipeline is not None:
+            info.update(self.pipeline.stats())
+        elif self._finishing:
+            # Backlog still being transcribed after a stop(wait=False)
+            finishing = [p.stats() for p in self._finishing]
+            info["backlog_seconds"] = round(sum(stats["backlog_seconds"] for stats in finishing), 3)
+            info["queue_depth"] = sum(stats["queue_depth"] for stats in finishing)
+            info["in_flight"] = sum(stats["in_flight"] for stats in finishing)
+        return info
+
+
+class SessionManager:
+    def __init__(self, num_workers=None, segment_log=None):
+        """
+        Run several recording sessions at once on one shared set of transcription workers.
+
+        Every session records from its own device into its own directory, but all of them
+        queue chunks for the same SharedWorkerPool, which serves them round-robin. The model
+        comes from model_registry, so however many sessions run, it is loaded once, and
+        sessions take turns on it (see model_registry.inference_lock).
+
+        Args:
+            num_workers: Shared transcription worker threads (default: audio_handler.worker_count())
+            segment_log: Optional SegmentLog that receives every session's segments
+        """
+        self.num_workers = num_workers or audio_handler.worker_count()
+        self.segment_log = segment_log
+        self._sessions = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self, session_id=None, device_index=audio_handler.DEVICE_INDEX, output_dir=None):
+        """
+        Start a session, creating it if it doesn't exist yet.
+
+        Restarting a stopped session continues its chunk numbering in the same directory,
+        once the transcription of its earlier backlog has finished.
+
+        Returns:
+            RecordingSession: The session
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = SharedWorkerPool(self.num_workers)
+            session_id = session_id or uuid.uuid4().hex[:8]
+            session = self._sessions.get(session_id)
+            if session is None:
+                output_dir = output_dir or os.path.join(SESSIONS_DIR, session_id)
+                session = RecordingSession(session_id, device_index, output_dir)
+                self._sessions[session_id] = session
+            pool = self._pool
+        # Outside the lock: the session may wait for its earlier backlog to be transcribed
+        session.start(pool, self.segment_log)
+        return session
+
+    def stop(self, session_id, wait=True):
+        """
+        Stop a session; with wait=True, also wait for its queued chunks to be transcribed.
+
+        Returns:
+            RecordingSession: The session, or None if there is no such session
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.stop(wait)
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id):
+        """Stop a session and forget it."""
+        self.stop(session_id)
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def stats(self):
+        with self._lock:
+            pool_stats = self._pool.stats() if self._pool is not None else {"workers": self.num_workers}
+            recording = sum(1 for session in self._sessions.values() if session.is_recording)
+            stats = {"sessions": len(self._sessions), "recording": recording, **pool_stats}
+        if audio_handler.BATCH_INFERENCE:
+            stats.update(audio_handler.batch_scheduler().stats())
+        if audio_handler.ADAPTIVE_MODEL:
+            stats.update(audio_handler.model_governor().stats())
+        return stats
@@ -0,0 +1,180 @@
+import string
+import time
+
+import numpy as np
+
+import model_registry
+
+SAMPLE_RATE = 16000
+PROMPT_CHARS = 200  # How much committed text is passed back to Whisper as context
+
+
+def _normalize(word):
+    """Compare words without case, surrounding whitespace or punctuation."""
+    return word.strip().lower().strip(string.punctuation)
+
+
+class StreamingTranscriber:
+    def __init__(self, model_name=model_registry.DEFAULT_MODEL, step_seconds=1.0,
+                 max_buffer_seconds=20.0, language=None, on_segment=None, governor=None):
+        """
+        Incremental Whisper transcription over a rolling audio buffer.
+
+        Every step_seconds of new audio the whole uncommitted buffer is decoded again, so
+        consecutive decodes overlap. Words that two consecutive decodes agree on are
+        committed as final and the buffer is trimmed up to the last committed word; the
+        rest is reported as a partial hypothesis that may still change.
+
+        Args:
+            model_name: Whisper model to use (default: model_registry.DEFAULT_MODEL)
+            step_seconds: New audio needed before re-decoding; the latency target for partials
+            max_buffer_seconds: Upper bound on the decoded window; when exceeded, everything but
+                the last step is committed even without agreement (must stay under 30 s)
+            language: Language code to skip detection, or None to detect per window
+            on_segment: Optional callback receiving each segment dict as it is produced
+            governor: Optional governor.ModelGovernor that picks the model for each decode;
+                model_name is then only used until the first decode
+        """
+        if max_buffer_seconds >= 30:
+            raise ValueError("max_buffer_seconds must be shorter than Whisper's 30 s window")
+        self.model_name = model_name
+        self.step_seconds = step_seconds
+        self.max_buffer_seconds = max_buffer_seconds
+        self.language = language
+        self.on_segment = on_segment
+        self.governor = governor
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0      # Stream time of buffer[0] in seconds
+        self.committed_text = ""
+        self._pending_samples = 0     # Samples added since the last decode
+        self._previous_words = []     # Uncommitted words from the last decode
+
+    def feed(self, audio):
+        """
+        Add float32 16 kHz mono audio and decode if enough new audio has arrived.
+
+        Returns:
+            list: Segment dicts produced by this call (see _emit)
+        """
+        self.buffer = np.concatenate((self.buffer, audio.astype(np.float32, copy=False)))
+        self._pending_samples += len(audio)
+        if self._pending_samples < self.step_seconds * SAMPLE_RATE:
+            return []
+        new_seconds = self._pending_samples / SAMPLE_RATE
+        self._pending_samples = 0
+        return self._process_window(new_seconds)
+
+    def finish(self):
+        """Decode what is left in the buffer and commit all of it."""
+        if len(self.buffer) == 0:
+            return []
+        words = self._decode()
+        segments = []
+        if words:
+            segments.append(self._commit(words))
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self._previous_words = []
+        return segments
+
+    def stream(self, blocks):
+        """
+        Generator yielding segments while consuming an iterable of audio blocks.
+
+        The iterable may return whatever has accumulated since it was last asked, so
+        slow decodes naturally batch up more audio instead of falling behind.
+        """
+        for block in blocks:
+            for segment in self.feed(block):
+                yield segment
+        for segment in self.finish():
+            yield segment
+
+    def _process_window(self, new_seconds):
+        """Decode the buffer, commit the agreed prefix and report the rest as partial."""
+        words = self._decode(new_seconds)
+
+        # Local agreement: commit the prefix this decode shares with the previous one
+        agreed = 0
+        for previous, current in zip(self._previous_words, words):
+            if _normalize(previous["word"]) != _normalize(current["word"]):
+                break
+            agreed += 1
+
+        # Latency bound: don't let the window grow past max_buffer_seconds
+        buffer_seconds = len(self.buffer) / SAMPLE_RATE
+        if buffer_seconds > self.max_buffer_seconds:
+            horizon = self.buffer_offset + buffer_seconds - self.step_seconds
+            while agreed < len(words) and words[agreed]["end"] <= horizon:
+                agreed += 1
+
+        segments = []
+        if agreed:
+            segments.append(self._commit(words[:agreed]))
+        elif buffer_seconds > self.max_buffer_seconds:
+            # Nothing recognizable (e.g. long silence): drop all but the last step
+            self._trim(self.buffer_offset + buffer_seconds - self.step_seconds)
+
+        self._previous_words = words[agreed:]
+        if self._previous_words:
+            segments.append(self._emit(self._previous_words, final=False))
+        return segments
+
+    def _decode(self, new_seconds=0.0):
+        """
+        Run Whisper on the current buffer and return words with stream timestamps.
+
+        The governor is told how long decoding took per second of new audio (new_seconds):
+        above 1 the transcriber falls further behind the stream with every step.
+        """
+        if self.governor is not None:
+            self.model_name = self.governor.current
+        model = model_registry.get_model(self.model_name)
+        started = time.perf_counter()
+        result = model_registry.transcribe(model, self.buffer,
+                                           language=self.language,
+                                           word_timestamps=True,
+                                           condition_on_previous_text=False,
+                                           initial_prompt=self.committed_text[-PROMPT_CHARS:] or None)
+        if self.governor is not None:
+            self.governor.record(self.model_name, new_seconds, started, time.perf_counter())
+        words = []
+        for segment in result["segments"]:
+            for word in segment.get("words", []):
+                words.append({"word": word["word"],
+                              "start": self.buffer_offset + word["start"],
+                              "end": self.buffer_offset + word["end"]})
+        return words
+
+    def _commit(self, words):
+        """Mark words as final and drop the audio they cover from the buffer."""
+        segment = self._emit(words, final=True)
+        self.committed_text += segment["text"]
+        self._trim(words[-1]["end"])
+        return segment
+
+    def _trim(self, until):
+        """Discard buffered audio before stream time `until`."""
+        cut = int(round((until - self.buffer_offset) * SAMPLE_RATE))
+        cut = min(max(cut, 0), len(self.buffer))
+        self.buffer = self.buffer[cut:]
+        self.buffer_offset += cut / SAMPLE_RATE
+
+    def _emit(self, words, final):
+        """
+        Build a segment dict and pass it to the callback.
+
+        Returns:
+            dict: {"start", "end", "text", "final", "emitted_at", "model"} with times in stream seconds
+        """
+        segment = {
+            "start": round(words[0]["start"], 3),
+            "end": round(words[-1]["end"], 3),
+            "text": "".join(word["word"] for word in words),
+            "final": final,
+            "emitted_at": time.time(),
+            "model": self.model_name,
+        }
+        if self.on_segment is not None:
+            self.on_segment(segment)
+        return segment
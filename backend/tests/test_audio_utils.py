@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from audio_utils import StreamResampler
+
+BLOCK_SIZES = (0, 1, 2, 5, 37, 441, 1024, 3000)
+
+
+def _stream(resampler, audio, rng):
+    blocks = []
+    position = 0
+    while position < len(audio):
+        size = int(rng.choice(BLOCK_SIZES))
+        blocks.append(resampler.process(audio[position:position + size]))
+        position += size
+    blocks.append(resampler.flush())
+    return np.concatenate(blocks)
+
+
+@pytest.mark.parametrize("orig_rate, target_rate", [(44100, 16000), (48000, 16000), (22050, 16000), (8000, 16000)])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streaming_matches_resample_poly(orig_rate, target_rate, seed):
+    rng = np.random.default_rng(seed)
+    audio = rng.uniform(-1, 1, 20000).astype(np.float32)
+    resampler = StreamResampler(orig_rate, target_rate)
+
+    streamed = _stream(resampler, audio, rng)
+    expected = resample_poly(audio, resampler.up, resampler.down)
+
+    assert streamed.shape == expected.shape
+    np.testing.assert_allclose(streamed, expected, atol=1e-5)
+
+
+def test_streaming_matches_resample_poly_per_channel():
+    rng = np.random.default_rng(3)
+    audio = rng.uniform(-1, 1, (10000, 2)).astype(np.float32)
+    resampler = StreamResampler(44100, 16000)
+
+    streamed = _stream(resampler, audio, rng)
+
+    for channel in range(2):
+        expected = resample_poly(audio[:, channel], resampler.up, resampler.down)
+        np.testing.assert_allclose(streamed[:, channel], expected, atol=1e-5)
+
+
+def test_empty_and_tiny_blocks():
+    resampler = StreamResampler(44100, 16000)
+
+    assert resampler.process(np.zeros(0, dtype=np.float32)).shape == (0,)
+    out = [resampler.process(np.ones(5, dtype=np.float32)) for _ in range(20)]
+    assert sum(len(block) for block in out) + len(resampler.flush()) == -(-100 * 160 // 441)
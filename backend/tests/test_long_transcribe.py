@@ -0,0 +1,50 @@
+import argparse
+import threading
+
+import numpy as np
+import pytest
+
+import long_transcribe
+from long_transcribe import SAMPLE_RATE, find_cut_points
+
+
+def _tone_with_pause(seconds=120, pause=(30, 40)):
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    audio[pause[0] * SAMPLE_RATE:pause[1] * SAMPLE_RATE] = 0
+    return audio
+
+
+def _find_cut_points_or_fail(audio, *args, timeout=10):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("cuts", find_cut_points(audio, *args)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "find_cut_points did not return"
+    return result["cuts"]
+
+
+@pytest.mark.parametrize("segment_seconds", [5, 20, 60])
+def test_segments_shorter_than_search_window_terminate(segment_seconds):
+    # One dominant pause, found again from the next target when segments are shorter than the search
+    cuts = _find_cut_points_or_fail(_tone_with_pause(), segment_seconds, long_transcribe.SEARCH_SECONDS)
+
+    assert cuts
+    gaps = np.diff([0.0] + cuts)
+    assert np.all(gaps >= segment_seconds / 2 - 0.1)
+    assert cuts[-1] < 120
+
+
+def test_cut_lands_in_the_pause():
+    cuts = _find_cut_points_or_fail(_tone_with_pause(), 35, 10)
+
+    assert 30 <= cuts[0] <= 40
+
+
+def test_non_positive_segment_seconds_is_rejected():
+    with pytest.raises(ValueError):
+        find_cut_points(_tone_with_pause(10), 0)
+    for value in ("0", "-20", "abc"):
+        with pytest.raises((argparse.ArgumentTypeError, ValueError)):
+            long_transcribe._positive_seconds(value)
+    assert long_transcribe._positive_seconds("20") == 20.0
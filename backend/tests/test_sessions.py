@@ -0,0 +1,100 @@
+import collections
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+import archiver
+import audio_handler
+import benchmark
+import journal
+import model_registry
+from sessions import SessionManager
+
+MODEL_SECONDS = 0.5  # Slower than the fake device delivers chunks, so a backlog builds up
+
+
+class SlowModel:
+    def transcribe(self, audio, **options):
+        time.sleep(MODEL_SECONDS)
+        duration = len(audio) / audio_handler.TARGET_RATE
+        return {"text": " hello", "language": "en",
+                "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": duration, "text": " hello"}]}
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    source = benchmark.ReplaySource(benchmark.synthetic_speech(60), benchmark.SYNTHETIC_RATE)
+    monkeypatch.delitem(sys.modules, "pyaudio", raising=False)
+    benchmark.install_fake_pyaudio(source, speed=4.0)
+
+    model = SlowModel()
+    monkeypatch.setattr(model_registry, "get_model", lambda *args, **kwargs: model)
+    monkeypatch.setattr(model_registry, "transcribe", lambda model, audio, **options: model.transcribe(audio))
+    for name, value in {"BATCH_INFERENCE": False, "CACHE_TRANSCRIPTIONS": False, "ADAPTIVE_MODEL": False,
+                        "SKIP_SILENCE": False, "ARCHIVE_CHUNKS": True, "CPU_PROFILE": False,
+                        "MIN_CHUNK_SECONDS": 1, "MAX_CHUNK_SECONDS": 2}.items():
+        monkeypatch.setattr(audio_handler, name, value)
+    return SessionManager(num_workers=1)
+
+
+def _events(output_dir):
+    with open(os.path.join(output_dir, journal.JOURNAL_NAME), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_start_while_previous_stop_is_finishing_transcribes_each_chunk_once(recorder, tmp_path):
+    output_dir = str(tmp_path / "session")
+    session = recorder.start("meeting", output_dir=output_dir)
+    deadline = time.monotonic() + 30
+    while session.pipeline.stats()["queue_depth"] < 2:
+        assert time.monotonic() < deadline, "no backlog built up"
+        time.sleep(0.05)
+
+    recorder.stop("meeting", wait=False)
+    assert session.state == "finishing"
+    recorder.start("meeting")
+    time.sleep(1)
+    recorder.stop("meeting", wait=True)
+
+    events = _events(output_dir)
+    transcribed = collections.Counter(e["chunk"] for e in events if e["event"] == journal.TRANSCRIBED)
+    written = collections.Counter(e["chunk"] for e in events if e["event"] == journal.WRITTEN)
+    captured = {e["chunk"] for e in events if e["event"] == journal.CAPTURED}
+    assert transcribed and max(transcribed.values()) == 1
+    assert max(written.values()) == 1
+    assert set(written) == captured
+    assert not glob.glob(os.path.join(output_dir, "recovered_*"))
+
+
+def test_recovery_only_trusts_complete_archived_wavs(recorder, tmp_path):
+    output_dir = tmp_path / "session"
+    output_dir.mkdir()
+    samples = np.zeros((audio_handler.TARGET_RATE, audio_handler.TARGET_CHANNELS), dtype=np.int16)
+    archiver.write_wav(str(output_dir / "chunk_1.wav"), samples, audio_handler.TARGET_RATE)
+    archiver.write_wav(str(output_dir / "chunk_2.wav"), samples, audio_handler.TARGET_RATE)
+    with open(output_dir / "chunk_2.wav", 'r+b') as f:
+        f.truncate(1000)  # Torn by a crash
+    (output_dir / "chunk_3.wav.tmp").write_bytes(b"RIFF")  # Crashed before the rename
+    crashed = journal.SessionJournal(str(output_dir / journal.JOURNAL_NAME))
+    for number in (1, 2, 3):
+        crashed.record(journal.CAPTURED, number, start=number - 1.0, end=float(number))
+    crashed.record(journal.ARCHIVED, 1, wav=str(output_dir / "chunk_1.wav"))
+    crashed.record(journal.ARCHIVED, 2, wav=str(output_dir / "chunk_2.wav"))
+    crashed.close()
+
+    recorder.start("meeting", output_dir=str(output_dir))
+    time.sleep(1)
+    recorder.stop("meeting", wait=True)
+
+    events = _events(str(output_dir))
+    finished = {e["chunk"]: e["event"] for e in events if e["event"] in journal.FINISHED}
+    assert finished[1] == journal.WRITTEN
+    assert finished[2] == journal.LOST
+    assert finished[3] == journal.LOST
+    archived = {e["chunk"] for e in events if e["event"] == journal.ARCHIVED}
+    assert {e["chunk"] for e in events if e["event"] == journal.CAPTURED and e["chunk"] > 3} <= archived
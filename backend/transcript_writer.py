@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+
+FORMATS = ("json", "srt", "vtt", "tsv", "txt")
+
+
+def format_timestamp(seconds, always_include_hours=False, decimal_marker="."):
+    """Format seconds like Whisper's writers: [HH:]MM:SS.mmm."""
+    milliseconds = int(round(seconds * 1000.0))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1_000)
+    hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+    return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def offset_segments(segments, offset):
+    """Shift Whisper segments (and their word timestamps) by `offset` seconds, in place."""
+    for segment in segments:
+        segment["start"] = round(segment["start"] + offset, 3)
+        segment["end"] = round(segment["end"] + offset, 3)
+        segment["seek"] = segment.get("seek", 0) + int(round(offset * 100))  # seek counts 10 ms mel frames
+        for word in segment.get("words", []):
+            word["start"] = round(word["start"] + offset, 3)
+            word["end"] = round(word["end"] + offset, 3)
+    return segments
+
+
+class TranscriptWriter:
+    def __init__(self, basename, formats=FORMATS, first_chunk_number=1, on_segments=None,
+                 on_chunk_written=None):
+        """
+        Append transcribed segments to transcript files as chunks finish.
+
+        Every format is written incrementally: each chunk only appends its own lines, so
+        the files are always current and valid during a long session. The JSON file is kept
+        valid by rewriting only its closing bracket. Chunks finishing out of order (parallel
+        workers) are held back until the chunks before them are written or skipped.
+
+        Args:
+            basename: Path without extension, e.g. "audio_chunks/session_1"
+            formats: Any of "json", "srt", "vtt", "tsv", "txt" (default: all)
+            first_chunk_number: Number of the first chunk that will be added (default: 1)
+            on_segments: Optional function (segments) called with each chunk's segments, in
+                order and with session timestamps, right after they are written
+            on_chunk_written: Optional function (chunk_number) called once a chunk's segments
+                are on disk (or it was skipped)
+        """
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown transcript formats: {sorted(unknown)}")
+
+        self.basename = basename
+        self.formats = tuple(formats)
+        self.segment_count = 0
+        self.language = None
+        self.on_segments = on_segments
+        self.on_chunk_written = on_chunk_written
+        self._next_chunk = first_chunk_number
+        self._waiting = {}  # chunk number -> (segments, offset), or None if skipped
+        self._lock = threading.Lock()
+        self._files = {}
+        self._json_tail = b""
+
+        for fmt in self.formats:
+            self._files[fmt] = open(f"{basename}.{fmt}", 'w+b' if fmt == "json" else 'w',
+                                    encoding=None if fmt == "json" else 'utf-8')
+        if "vtt" in self._files:
+            self._files["vtt"].write("WEBVTT\n\n")
+        if "tsv" in self._files:
+            self._files["tsv"].write("start\tend\ttext\n")
+        if "json" in self._files:
+            self._files["json"].write(b'{"segments": [')
+            self._write_json_tail()
+        self._flush()
+
+    def add(self, chunk_number, segments, offset=0.0, language=None):
+        """
+        Add a chunk's Whisper segments, with times relative to the chunk start.
+
+        Args:
+            chunk_number: Number of the chunk the segments came from
+            segments: result['segments'] from Whisper
+            offset: Start of the chunk's audio in the session, in seconds
+            language: Detected language, recorded in the JSON file
+        """
+        with self._lock:
+            if language and self.language is None:
+                self.language = language
+            self._waiting[chunk_number] = (segments, offset)
+            self._write_ready()
+
+    def skip(self, chunk_number):
+        """Mark a chunk as producing no text (silent, dropped or failed)."""
+        with self._lock:
+            self._waiting[chunk_number] = None
+            self._write_ready()
+
+    def close(self):
+        """Write any chunks still held back, finish the JSON file and close everything."""
+        with self._lock:
+            if self._files is None:
+                return
+            for number in sorted(self._waiting):
+                self._next_chunk = number
+                self._write_ready()
+            if "json" in self._files:
+                self._remove_json_tail()
+                self._write_json_tail(final=True)
+            for f in self._files.values():
+                f.close()
+            self._files = None
+
+    def _write_ready(self):
+        """Write waiting chunks in order, up to the first one that hasn't finished yet."""
+        if self._files is None:
+            return
+        written = []
+        while self._next_chunk in self._waiting:
+            number = self._next_chunk
+            entry = self._waiting.pop(number)
+            self._next_chunk += 1
+            if entry is not None:
+                segments, offset = entry
+                self._append(offset_segments(segments, offset))
+                if self.on_segments is not None and segments:
+                    self.on_segments(segments)
+            written.append(number)
+        self._flush()
+        if self.on_chunk_written is not None:
+            for number in written:
+                self.on_chunk_written(number)
+
+    def _append(self, segments):
+        for segment in segments:
+            index = self.segment_count
+            self.segment_count += 1
+            segment["id"] = index
+            text = segment["text"].strip().replace("-->", "->")
+            start, end = segment["start"], segment["end"]
+
+            files = self._files
+            if "txt" in files:
+                files["txt"].write(text + "\n")
+            if "srt" in files:
+                files["srt"].write(f"{index + 1}\n"
+                                   f"{format_timestamp(start, True, ',')} --> "
+                                   f"{format_timestamp(end, True, ',')}\n{text}\n\n")
+            if "vtt" in files:
+                files["vtt"].write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n")
+            if "tsv" in files:
+                files["tsv"].write(f"{round(1000 * start)}\t{round(1000 * end)}\t"
+                                   f"{text.replace(chr(9), ' ')}\n")
+            if "json" in files:
+                self._remove_json_tail()
+                separator = b", " if index else b""
+                files["json"].write(separator + json.dumps(segment).encode('utf-8'))
+                self._write_json_tail()
+
+    def _remove_json_tail(self):
+        f = self._files["json"]
+        f.seek(-len(self._json_tail), os.SEEK_END)
+        f.truncate()
+
+    def _write_json_tail(self, final=False):
+        """Append the closing part of the JSON file so it always parses."""
+        f = self._files["json"]
+        tail = {"language": self.language}
+        if final:
+            # The full text is only assembled once, from the segments already on disk
+            f.seek(0)
+            segments = json.loads(f.read() + b"]}")["segments"]
+            tail = {"text": "".join(segment["text"] for segment in segments), **tail}
+        self._json_tail = b"], " + json.dumps(tail)[1:].encode('utf-8')
+        f.write(self._json_tail)
+
+    def _flush(self):
+        for f in self._files.values():
+            f.flush()
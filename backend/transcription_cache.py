@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_PATH = "transcription_cache.sqlite"
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # Stored results beyond this are evicted, least recently used first
+
+_cache = None
+_lock = threading.Lock()
+
+
+def audio_key(audio, model_name, options=None):
+    """
+    Cache key for transcribing `audio` with a model and decode options.
+
+    The key hashes the decoded float32 PCM rather than a file name, so the same audio is
+    recognized whether it comes from a live chunk, a re-run or a copied WAV.
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+    digest.update(json.dumps([model_name, options or {}], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        """
+        Persistent cache of Whisper results keyed by audio_key().
+
+        Results are stored as JSON in SQLite, so the cache survives restarts and can be
+        shared by the batch tool's worker processes. When the stored results grow past
+        max_bytes the least recently used ones are removed.
+
+        Args:
+            path: SQLite database file (default: CACHE_PATH)
+            max_bytes: Size bound for the stored results (default: MAX_CACHE_BYTES)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                         "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached result for `key` (a fresh copy), or None."""
+        with self._lock:
+            row = self._db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Store a result and evict old entries if the cache is over its size bound."""
+        data = json.dumps(result)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, data, len(data), time.time()))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "cache_evictions": self.evictions,
+                "cache_entries": entries,
+                "cache_bytes": size,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_cache():
+    """Return the process-wide cache at CACHE_PATH, opening it on first use."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = TranscriptionCache(CACHE_PATH, MAX_CACHE_BYTES)
+        return _cache
+
+
+def transcribe_cached(audio, model_name, options, transcribe):
+    """
+    Return the cached result for this audio/model/options, or call transcribe() and cache it.
+
+    Args:
+        audio: float32 16 kHz mono array that will be transcribed
+        model_name: Whisper model name
+        options: Dict of decode options that affect the result (part of the key)
+        transcribe: Function () -> Whisper result dict, called on a miss
+    """
+    cache = get_cache()
+    key = audio_key(audio, model_name, options)
+    result = cache.get(key)
+    if result is None:
+        result = transcribe()
+        cache.put(key, result)
+    return result
@@ -0,0 +1,205 @@
+import threading
+
+import numpy as np
+
+FRAME_SECONDS = 0.03  # Analysis frame length
+NOISE_WINDOW_SECONDS = 3.0  # The noise floor is the quietest frame energy over this window
+ENERGY_RATIO = 3.0  # Speech must be this many times louder (RMS) than the noise floor
+MIN_ENERGY = 10 ** (-50 / 20)  # Absolute floor of -50 dBFS so digital silence is never speech
+MAX_NOISE_FLOOR = 10 ** (-35 / 20)  # Cap so long stretches of continuous speech aren't taken as noise
+MAX_SPEECH_ZCR = 0.25  # Quiet frames crossing zero more often than this are treated as noise
+HANGOVER_SECONDS = 0.3  # Keep speech "on" this long after the last active frame
+PAD_SECONDS = 0.2  # Silence kept around trimmed speech so word edges aren't clipped
+
+
+def _as_float(samples):
+    """Return mono samples as float32 in [-1, 1]."""
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) * (1.0 / 32768.0)
+    return samples.astype(np.float32, copy=False)
+
+
+class VoiceActivityDetector:
+    def __init__(self, rate=16000, frame_seconds=FRAME_SECONDS, energy_ratio=ENERGY_RATIO,
+                 min_energy=MIN_ENERGY, max_noise_floor=MAX_NOISE_FLOOR, max_speech_zcr=MAX_SPEECH_ZCR,
+                 noise_window_seconds=NOISE_WINDOW_SECONDS, hangover_seconds=HANGOVER_SECONDS):
+        """
+        Energy and zero-crossing voice activity detector working on whole arrays.
+
+        Every call frames the input with a reshape and computes RMS energy and zero-crossing
+        rate for all frames at once. The noise floor follows the quietest recent frames
+        (minimum statistics), and a hangover keeps short pauses inside a word from being
+        reported as silence. State carries over between calls, so audio can be fed in pieces.
+
+        Args:
+            rate: Sample rate of the audio (default: 16000)
+            frame_seconds: Analysis frame length in seconds
+            energy_ratio: Required RMS ratio between speech and the noise floor
+            min_energy: Absolute RMS below which a frame is never speech
+            max_noise_floor: Highest RMS the adaptive noise floor may reach
+            max_speech_zcr: Zero-crossing rate above which quiet frames count as noise
+            noise_window_seconds: Span of the rolling minimum used as noise floor
+            hangover_seconds: How long speech stays active after the last loud frame
+        """
+        self.rate = rate
+        self.frame_length = max(int(rate * frame_seconds), 1)
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.max_noise_floor = max_noise_floor
+        self.max_speech_zcr = max_speech_zcr
+        self.noise_frames = max(int(noise_window_seconds / frame_seconds), 1)
+        self.hangover_frames = int(hangover_seconds / frame_seconds)
+
+        self._remainder = np.zeros(0, dtype=np.float32)  # Samples that didn't fill a frame
+        self._energy_history = np.zeros(0, dtype=np.float32)
+        self._frames_seen = 0
+        self._last_active = -np.inf  # Index of the last frame that was loud enough
+        self.noise_floor = min_energy
+        self.last_energy = np.zeros(0, dtype=np.float32)  # RMS of the frames from the last call
+
+    @property
+    def frame_seconds(self):
+        return self.frame_length / self.rate
+
+    def process(self, samples):
+        """
+        Classify the frames completed by these samples.
+
+        Args:
+            samples: int16 or float32 audio, mono or (frames, channels)
+
+        Returns:
+            np.ndarray: One bool per completed frame, True where speech is active
+        """
+        samples = np.concatenate((self._remainder, _as_float(samples)))
+        n_frames = len(samples) // self.frame_length
+        self._remainder = samples[n_frames * self.frame_length:]
+        if n_frames == 0:
+            self.last_energy = np.zeros(0, dtype=np.float32)
+            return np.zeros(0, dtype=bool)
+
+        frames = samples[:n_frames * self.frame_length].reshape(n_frames, self.frame_length)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        self.last_energy = energy
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_length
+
+        # Rolling minimum over this call plus the tail of the previous one
+        from scipy.ndimage import minimum_filter1d  # Deferred: scipy is slow to import
+        history = np.concatenate((self._energy_history, energy))
+        floor = minimum_filter1d(history, self.noise_frames, origin=(self.noise_frames - 1) // 2)
+        floor = np.clip(floor[len(self._energy_history):], self.min_energy, self.max_noise_floor)
+        self._energy_history = history[-(self.noise_frames - 1):] if self.noise_frames > 1 else history[:0]
+        self.noise_floor = float(floor[-1])
+
+        threshold = floor * self.energy_ratio
+        # Loud frames are speech; moderately loud ones only if they don't look like hiss
+        loud = (energy > threshold) & ((zcr <= self.max_speech_zcr) | (energy > threshold * 4))
+
+        # Hangover: a frame is active if a loud frame happened within hangover_frames before it
+        index = np.arange(self._frames_seen, self._frames_seen + n_frames)
+        last_loud = np.maximum.accumulate(np.where(loud, index, -np.inf))
+        last_loud = np.maximum(last_loud, self._last_active)
+        active = index - last_loud <= self.hangover_frames
+
+        self._last_active = float(last_loud[-1])
+        self._frames_seen += n_frames
+        return active
+
+
+def speech_regions(active, frame_length, pad_frames=0):
+    """
+    Turn per-frame activity into (start_sample, end_sample) regions.
+
+    Args:
+        active: Bool array from VoiceActivityDetector.process
+        frame_length: Samples per frame
+        pad_frames: Frames of context added on both sides of each region
+    """
+    if pad_frames and active.any():
+        kernel = np.ones(2 * pad_frames + 1, dtype=bool)
+        active = np.convolve(active, kernel, mode='same') > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    return [(start * frame_length, end * frame_length) for start, end in zip(edges[::2], edges[1::2])]
+
+
+class SpeechGate:
+    def __init__(self, rate=16000, pad_seconds=PAD_SECONDS, **vad_options):
+        """
+        Decide what audio is worth sending to the model.
+
+        Chunks without speech are skipped and leading/trailing silence is trimmed. Each
+        chunk gets its own detector, so the gate can be shared by parallel workers.
+
+        Args:
+            rate: Sample rate of the audio (default: 16000)
+            pad_seconds: Silence kept before and after the detected speech
+            vad_options: Extra keyword arguments for VoiceActivityDetector
+        """
+        self.rate = rate
+        self.pad_seconds = pad_seconds
+        self.vad_options = vad_options
+
+        self._lock = threading.Lock()
+        self._chunks = 0
+        self._skipped_chunks = 0
+        self._total_seconds = 0.0
+        self._skipped_seconds = 0.0
+        self._inference_seconds = 0.0
+        self._inferred_audio_seconds = 0.0
+
+    def process(self, samples):
+        """
+        Trim silence from a chunk.
+
+        Returns:
+            tuple: (trimmed_samples, offset_seconds), or (None, 0.0) if the chunk has no speech
+        """
+        detector = VoiceActivityDetector(self.rate, **self.vad_options)
+        active = detector.process(samples)
+        pad_frames = int(self.pad_seconds / detector.frame_seconds)
+        regions = speech_regions(active, detector.frame_length, pad_frames)
+
+        total = len(samples)
+        if regions:
+            start = regions[0][0]
+            end = min(regions[-1][1], total)
+            if end == len(active) * detector.frame_length:
+                end = total  # Speech runs to the end, keep the partial last frame too
+            trimmed = samples[start:end]
+        else:
+            start, trimmed = 0, None
+
+        with self._lock:
+            self._chunks += 1
+            self._total_seconds += total / self.rate
+            kept = 0 if trimmed is None else len(trimmed)
+            self._skipped_seconds += (total - kept) / self.rate
+            if trimmed is None:
+                self._skipped_chunks += 1
+        return trimmed, start / self.rate
+
+    def record_inference(self, audio_seconds, elapsed_seconds):
+        """Tell the gate how long the model took, so saved time can be estimated."""
+        with self._lock:
+            self._inferred_audio_seconds += audio_seconds
+            self._inference_seconds += elapsed_seconds
+
+    def stats(self):
+        """
+        Returns:
+            dict: Chunks and audio seconds skipped, and estimated inference seconds saved
+        """
+        with self._lock:
+            rtf = (self._inference_seconds / self._inferred_audio_seconds
+                   if self._inferred_audio_seconds else 0.0)
+            return {
+                "vad_chunks": self._chunks,
+                "vad_skipped_chunks": self._skipped_chunks,
+                "vad_audio_seconds": round(self._total_seconds, 3),
+                "vad_skipped_seconds": round(self._skipped_seconds, 3),
+                "vad_inference_seconds_saved": round(self._skipped_seconds * rtf, 3),
+            }
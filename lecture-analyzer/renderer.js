@@ -4,11 +4,29 @@ document.addEventListener('DOMContentLoaded', () => {
     const startButton = document.getElementById('start');
     const stopButton = document.getElementById('stop');
     const transcriptionsContainer = document.getElementById('transcriptions');
+    let transcriptStream = null;
+
+    // Receive segments from the backend as soon as they are transcribed
+    function followTranscript() {
+        if (transcriptStream) {
+            return;
+        }
+        transcriptStream = new EventSource('http://127.0.0.1:5000/transcript/stream');
+        transcriptStream.addEventListener('segment', (event) => {
+            const segment = JSON.parse(event.data);
+            const paragraph = document.createElement('p');
+            paragraph.textContent = segment.text;
+            transcriptionsContainer.appendChild(paragraph);
+            transcriptionsContainer.scrollTop = transcriptionsContainer.scrollHeight;
+        });
+    }
 
     startButton.addEventListener('click', async () => {
         try {
             const response = await axios.post('http://127.0.0.1:5000/start');
             alert(response.data.status);
+            transcriptionsContainer.innerHTML = '';
+            followTranscript();
             startButton.disabled = true;
             stopButton.disabled = false;
         } catch (error) {